@@ -4,7 +4,7 @@ from fastapi.exceptions import RequestValidationError
 from starlette.exceptions import HTTPException as StarletteHTTPException
 from starlette.status import HTTP_500_INTERNAL_SERVER_ERROR
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 
 # -------- Pydantic Models --------
@@ -32,11 +32,13 @@ class ApiError(Exception):
         message: str = "Something went wrong",
         errors: Optional[List[str]] = None,
         stack: str = "",
+        headers: Optional[Dict[str, str]] = None,
     ):
         self.status_code = status_code
         self.message = message
         self.errors = errors or []
         self.stack = stack
+        self.headers = headers
 
 
 # -------- Exception Handlers --------
@@ -47,7 +49,7 @@ async def api_error_handler(request: Request, exc: ApiError):
         errors=exc.errors,
         stack=exc.stack or None
     )
-    return JSONResponse(status_code=exc.status_code, content=payload.dict())
+    return JSONResponse(status_code=exc.status_code, content=payload.dict(), headers=exc.headers)
 
 
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
@@ -0,0 +1,204 @@
+import base64
+import json
+from datetime import datetime, timezone
+from typing import Literal, Optional
+
+from fastapi import APIRouter, Depends, Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from sqlalchemy import and_, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src import models
+from src.config import config
+from src.database import AsyncSessionLocal, get_async_db
+from src.api.errors import ApiError, ApiResponse
+from src.logger import logger
+
+router = APIRouter()
+
+Request = models.ModerationRequest
+Result = models.ModerationResult
+Notification = models.NotificationLog
+
+# Selectable fields and keyset (timestamp, id) columns of each history resource
+HISTORY_RESOURCES = {
+    "requests": {
+        "fields": {
+            "id": Request.id,
+            "content_type": Request.content_type,
+            "content_url": Request.content_url,
+            "status": Request.status,
+            "created_at": Request.created_at,
+        },
+        "keyset": (Request.created_at, Request.id),
+    },
+    "results": {
+        "fields": {
+            "id": Result.id,
+            "request_id": Result.request_id,
+            "content_type": Request.content_type,
+            "classification": Result.classification,
+            "confidence": Result.confidence,
+            "reasoning": Result.reasoning,
+            "llm_response": Result.llm_response,
+            "created_at": Request.created_at,
+        },
+        "keyset": (Request.created_at, Result.id),
+    },
+    "notifications": {
+        "fields": {
+            "id": Notification.id,
+            "request_id": Notification.request_id,
+            "channel": Notification.channel,
+            "kind": Notification.kind,
+            "status": Notification.status,
+            "sent_at": Notification.sent_at,
+            "transport": Notification.transport,
+            "latency_ms": Notification.latency_ms,
+            "error": Notification.error,
+        },
+        "keyset": (Notification.sent_at, Notification.id),
+    },
+}
+
+
+def encode_cursor(timestamp: datetime, row_id: int) -> str:
+    raw = json.dumps([timestamp.isoformat(), row_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        timestamp, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        timestamp = datetime.fromisoformat(timestamp)
+        if timestamp.tzinfo is not None:
+            # Columns hold naive UTC
+            timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+        return timestamp, int(row_id)
+    except Exception:
+        raise ApiError(400, "Invalid cursor", errors=["The cursor is malformed or was not issued by this API"])
+
+
+def parse_fields(resource: str, fields: Optional[str]) -> list[str]:
+    available = HISTORY_RESOURCES[resource]["fields"]
+    if not fields:
+        return list(available)
+    selected = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = [name for name in selected if name not in available]
+    if unknown:
+        raise ApiError(
+            400,
+            "Unknown fields requested",
+            errors=[f"Unknown field '{name}', expected one of: {', '.join(available)}" for name in unknown]
+        )
+    return selected
+
+
+def build_history_query(resource: str, user: str, fields: list[str], cursor: Optional[str]):
+    """
+    Newest-first query for one user's history, resuming after the cursor row.
+    """
+    spec = HISTORY_RESOURCES[resource]
+    timestamp_col, id_col = spec["keyset"]
+    columns = [spec["fields"][name].label(name) for name in fields]
+    # The keyset columns are always selected so the next cursor can be built
+    stmt = select(*columns, timestamp_col.label("_cursor_ts"), id_col.label("_cursor_id"))
+
+    if resource == "requests":
+        stmt = stmt.where(Request.email == user)
+    elif resource == "results":
+        stmt = stmt.select_from(Result).join(Request, Result.request_id == Request.id).where(Request.email == user)
+    else:
+        stmt = stmt.where(Notification.request_id.in_(select(Request.id).where(Request.email == user)))
+
+    if cursor:
+        after_ts, after_id = decode_cursor(cursor)
+        stmt = stmt.where(or_(timestamp_col < after_ts, and_(timestamp_col == after_ts, id_col < after_id)))
+    return stmt.order_by(timestamp_col.desc(), id_col.desc())
+
+
+def project(row, fields: list[str]) -> dict:
+    return {name: getattr(row, name) for name in fields}
+
+
+async def history_response(
+    resource: str,
+    user: str,
+    limit: Optional[int],
+    cursor: Optional[str],
+    fields: Optional[str],
+    format: str,
+    db: AsyncSession,
+):
+    selected = parse_fields(resource, fields)
+    stmt = build_history_query(resource, user, selected, cursor)
+
+    if format == "ndjson":
+        if limit is not None:
+            stmt = stmt.limit(limit)
+
+        async def ndjson_lines():
+            # Own session: the request-scoped one is closed before the body is streamed
+            async with AsyncSessionLocal() as stream_db:
+                result = await stream_db.stream(stmt)
+                async for row in result:
+                    yield json.dumps(jsonable_encoder(project(row, selected))) + "\n"
+
+        logger.info(f"Streaming {resource} history for user {user} as NDJSON")
+        return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
+
+    page_size = limit or config.HISTORY_PAGE_SIZE
+    rows = (await db.execute(stmt.limit(page_size + 1))).all()
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    next_cursor = encode_cursor(rows[-1]._cursor_ts, rows[-1]._cursor_id) if has_more else None
+
+    return ApiResponse(
+        status_code=200,
+        success=True,
+        message="Success",
+        data={"items": [project(row, selected) for row in rows], "next_cursor": next_cursor}
+    )
+
+
+LimitParam = Query(None, ge=1, le=config.HISTORY_MAX_PAGE_SIZE)
+FieldsParam = Query(None, description="Comma-separated list of fields to return")
+FormatParam = Query("json", description="json for a page with next_cursor, ndjson to stream every row")
+
+
+@router.get("/requests")
+async def request_history(
+    user: str,
+    limit: Optional[int] = LimitParam,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = FieldsParam,
+    format: Literal["json", "ndjson"] = FormatParam,
+    db: AsyncSession = Depends(get_async_db)
+):
+    return await history_response("requests", user, limit, cursor, fields, format, db)
+
+
+@router.get("/results")
+async def result_history(
+    user: str,
+    limit: Optional[int] = LimitParam,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = FieldsParam,
+    format: Literal["json", "ndjson"] = FormatParam,
+    db: AsyncSession = Depends(get_async_db)
+):
+    return await history_response("results", user, limit, cursor, fields, format, db)
+
+
+@router.get("/notifications")
+async def notification_history(
+    user: str,
+    limit: Optional[int] = LimitParam,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = FieldsParam,
+    format: Literal["json", "ndjson"] = FormatParam,
+    db: AsyncSession = Depends(get_async_db)
+):
+    return await history_response("notifications", user, limit, cursor, fields, format, db)
@@ -0,0 +1,76 @@
+import json
+from typing import Iterable
+
+from src.api.errors import ApiErrorResponse
+
+
+class BodySizeLimitMiddleware:
+    """
+    Rejects request bodies over max_bytes on the given path prefixes with 413.
+
+    Declared Content-Length values are checked before any of the body is
+    read; chunked bodies are counted as they stream in and cut off as soon
+    as they cross the limit, before the multipart parser spools them.
+    """
+
+    def __init__(self, app, max_bytes: int, path_prefixes: Iterable[str]):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.path_prefixes = tuple(path_prefixes)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.path_prefixes):
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        content_length = headers.get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > self.max_bytes:
+            await self._reject(send)
+            return
+
+        received = 0
+        exceeded = False
+        response_started = False
+
+        async def limited_receive():
+            nonlocal received, exceeded
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    exceeded = True
+                    raise ValueError(f"Request body exceeds {self.max_bytes} bytes")
+            return message
+
+        async def guarded_send(message):
+            nonlocal response_started
+            if exceeded:
+                # Replace whatever error the app produced for the aborted body with a 413
+                if not response_started:
+                    response_started = True
+                    await self._reject(send)
+                return
+            response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except Exception:
+            if not exceeded:
+                raise
+            if not response_started:
+                await self._reject(send)
+
+    async def _reject(self, send):
+        payload = ApiErrorResponse(
+            message="Request body is too large",
+            errors=[f"Maximum allowed size is {self.max_bytes} bytes"]
+        )
+        body = json.dumps(payload.dict()).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
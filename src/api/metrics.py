@@ -0,0 +1,128 @@
+import asyncio
+
+from fastapi import APIRouter, Depends
+from fastapi.responses import Response
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.batching import text_batcher
+from src.cache import verdict_cache
+from src.database import get_async_db
+from src.email_alerts import email_dispatcher
+from src.jobs import queue_stats
+from src.llm_classifier import llm_breaker, llm_limiter
+from src.logger import logger
+from src.metrics import registry, render_samples
+from src.persistence import write_behind
+from src.tts import audio_cache
+from src.worker import in_process_workers
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+router = APIRouter()
+
+
+def ratio(hits: int, lookups: int) -> float:
+    return hits / lookups if lookups else 0.0
+
+
+def executor_samples():
+    # asyncio.to_thread() and run_in_executor(None, ...) share the loop's default pool,
+    # which is only created on first use
+    executor = getattr(asyncio.get_running_loop(), "_default_executor", None)
+    if executor is None:
+        return []
+    return [
+        ({"state": "max"}, executor._max_workers),
+        ({"state": "started"}, len(executor._threads)),
+        ({"state": "queued"}, executor._work_queue.qsize()),
+    ]
+
+
+def queue_depth_samples():
+    return [
+        ({"queue": "text_batcher"}, text_batcher.stats()["queue_depth"]),
+        ({"queue": "write_behind"}, write_behind.stats()["queue_depth"]),
+        ({"queue": "email"}, email_dispatcher.stats()["queue_depth"]),
+    ]
+
+
+def llm_slot_samples():
+    limiter = llm_limiter.stats()
+    return [
+        ({"state": "in_flight"}, limiter["in_flight"]),
+        ({"state": "waiting"}, limiter["waiting"]),
+        ({"state": "max_concurrency"}, limiter["max_concurrency"]),
+    ]
+
+
+def cache_lookup_samples():
+    verdicts = verdict_cache.stats()
+    audio = audio_cache.stats()
+    return [
+        ({"cache": "verdict", "result": "memory_hit"}, verdicts["memory_hits"]),
+        ({"cache": "verdict", "result": "db_hit"}, verdicts["db_hits"]),
+        ({"cache": "verdict", "result": "miss"}, verdicts["misses"]),
+        ({"cache": "tts_audio", "result": "hit"}, audio["hits"]),
+        ({"cache": "tts_audio", "result": "miss"}, audio["misses"]),
+    ]
+
+
+def cache_hit_ratio_samples():
+    verdicts = verdict_cache.stats()
+    audio = audio_cache.stats()
+    return [
+        ({"cache": "verdict"}, verdicts["hit_ratio"]),
+        ({"cache": "tts_audio"}, ratio(audio["hits"], audio["hits"] + audio["misses"])),
+    ]
+
+
+registry.collector(
+    "moderation_executor_threads", "Default thread pool size, started threads and queued work items.",
+    "gauge", executor_samples,
+)
+registry.collector(
+    "moderation_queue_depth", "Items waiting in in-process queues.",
+    "gauge", queue_depth_samples,
+)
+registry.collector(
+    "moderation_llm_slots", "LLM concurrency limiter occupancy.",
+    "gauge", llm_slot_samples,
+)
+registry.collector(
+    "moderation_llm_rejected_total", "LLM calls rejected because the limiter queue was full.",
+    "counter", lambda: [({}, llm_limiter.stats()["rejected"])],
+)
+registry.collector(
+    "moderation_llm_breaker_open", "1 while the LLM circuit breaker is open.",
+    "gauge", lambda: [({}, 1 if llm_breaker.is_open else 0)],
+)
+registry.collector(
+    "moderation_job_workers_busy", "In-process job workers currently running a job.",
+    "gauge", lambda: [({}, in_process_workers.stats()["busy"])],
+)
+registry.collector(
+    "moderation_cache_lookups_total", "Cache lookups by outcome.",
+    "counter", cache_lookup_samples,
+)
+registry.collector(
+    "moderation_cache_hit_ratio", "Share of cache lookups served from the cache.",
+    "gauge", cache_hit_ratio_samples,
+)
+
+
+@router.get("/metrics")
+async def metrics(db: AsyncSession = Depends(get_async_db)):
+    """
+    Prometheus text exposition of stage latencies, saturation gauges, cache and token counters.
+    """
+    body = registry.render()
+    try:
+        job_queue = await db.run_sync(queue_stats)
+        body += "\n".join(render_samples(
+            "moderation_jobs", "Jobs in the database queue by status.",
+            "gauge", [({"status": status}, count) for status, count in sorted(job_queue.items())],
+        )) + "\n"
+    except Exception as e:
+        # The in-process metrics are still useful while the database is unreachable
+        logger.warning(f"Could not read job queue for metrics: {e}")
+    return Response(content=body, media_type=PROMETHEUS_CONTENT_TYPE)
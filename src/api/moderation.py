@@ -1,44 +1,96 @@
-import asyncio
-from fastapi import APIRouter, Depends, UploadFile, File, Form, BackgroundTasks
-from sqlalchemy.orm import joinedload, Session
+import json
+import math
+import os
+import re
+import time
+from typing import Literal, Optional
+from fastapi import APIRouter, Depends, UploadFile, File, Form, Request, WebSocket, WebSocketDisconnect
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import EmailStr
 
 from src import models, schemas
-from src.database import get_db, SessionLocal  
-from src.utils import upload_image_to_cloudinary, hash_string
-from src.llm_classifier import classify_image_gemini, classify_text_gemini
-from src.email_alerts import send_alert_email
-from src.email_template import moderation_email_template 
+from src.database import AsyncSessionLocal, get_async_db
+from src.jobs import enqueue_job, remove_spool_file, queue_stats
+from src.worker import in_process_workers
+from src.notifications import channel_limiters
+from src.email_alerts import email_dispatcher
+from src.events import request_events
+from src.utils import hash_string, spool_upload, PayloadTooLargeError
+from src.llm_classifier import (
+    classify_text_gemini_async,
+    LLMOverloadedError,
+    LLMUnavailableError,
+    llm_limiter,
+    llm_breaker,
+)
+from src.bulk import BulkInputError, completed_request, ingest, parse_items, resolve_text_verdicts, start_run
+from src.cache import verdict_cache
+from src.batching import text_batcher
+from src.persistence import write_behind
+from src.prefilter import prefilter
+from src.tts import MEDIA_TYPES, audio_cache, speech_streamer
+from src.near_duplicate import near_duplicate_index, normalize_text, simhash, fingerprint_to_hex
+from src.image_hash import image_hash_index
+from src.config import config
 from src.api.errors import ApiError, ApiResponse
 from src.logger import logger 
+from src.metrics import llm_tokens, stage_latency, timed
 
-from fastapi.responses import StreamingResponse
-from gtts import gTTS
-import io
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from starlette.requests import ClientDisconnect
 
 router = APIRouter()
 
-async def db_add_commit_refresh(db: Session, instance):
-    db.add(instance)
-    await asyncio.to_thread(db.commit)
-    await asyncio.to_thread(db.refresh, instance)
-    return instance
+AUDIO_KEY_PATTERN = re.compile(r"[0-9a-f]{64}")
+
+def classifier_unavailable(e) -> ApiError:
+    if isinstance(e, LLMUnavailableError):
+        message = "Classifier is degraded, please retry later"
+    else:
+        message = "Classifier is at capacity, please retry later"
+    return ApiError(
+        503,
+        message,
+        errors=[str(e)],
+        headers={"Retry-After": str(math.ceil(e.retry_after))}
+    )
 
-async def db_commit(db: Session):
-    await asyncio.to_thread(db.commit)
+def cached_audio_response(request: Request, key: str, path: str) -> Response:
+    """
+    Serve a cached audio file from disk with ETag, conditional GET and Range support.
+    """
+    etag = f'"{key}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": "public, max-age=31536000, immutable",
+        "Content-Location": str(request.url_for("tts_audio", key=key)),
+    }
+    if etag in [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=304, headers=headers)
+    extension = os.path.splitext(path)[1].lstrip(".")
+    headers["Content-Disposition"] = f"inline; filename=moderation.{extension}"
+    return FileResponse(path, media_type=MEDIA_TYPES.get(extension, "application/octet-stream"), headers=headers)
 
-from fastapi.responses import StreamingResponse
-from gtts import gTTS
-import io
 
 @router.post("/text-to-speech-moderation")
-async def text_to_speech_moderation(payload: schemas.TextModerationRequest):
+async def text_to_speech_moderation(
+    payload: schemas.TextModerationRequest,
+    request: Request,
+    db: AsyncSession = Depends(get_async_db)
+):
     if not payload.text.strip():
         raise ApiError(400, "Text content cannot be empty", errors=["Empty text"])
 
     try:
-        # Step 1: Run moderation via Gemini LLM
-        result_data = await asyncio.to_thread(classify_text_gemini, payload.text)
+        # Step 1: Reuse a cached verdict for this text, otherwise run moderation via Gemini LLM
+        content_hash = hash_string(payload.text)
+        result_data = None if payload.bypass_cache else await verdict_cache.lookup(db, content_hash)
+        await db.close()
+        if result_data is None:
+            result_data = await classify_text_gemini_async(payload.text)
+            verdict_cache.set(content_hash, result_data)
 
         # Step 2: Convert the LLM "description" (or full reasoning if you prefer) into speech
         text_for_tts = (
@@ -47,71 +99,117 @@ async def text_to_speech_moderation(payload: schemas.TextModerationRequest):
             f"Summary: {result_data.description}"
         )
 
-        def audio_stream():
-            audio_buffer = io.BytesIO()
-            tts = gTTS(text=text_for_tts, lang="en")
-            tts.write_to_fp(audio_buffer)
-            audio_buffer.seek(0)
-            yield from audio_buffer  # Stream audio chunks
-
-        # Step 3: Return as streaming MP3
+        # Step 3: Serve previously synthesized audio from disk
+        backend = speech_streamer.backend
+        key = audio_cache.key(backend.name, text_for_tts, config.TTS_LANG, config.TTS_VOICE)
+        if config.TTS_CACHE_ENABLED:
+            path = audio_cache.get(key)
+            if path is not None:
+                logger.info(f"TTS cache hit for audio {key[:12]}")
+                return cached_audio_response(request, key, path)
+
+        # Step 4: Stream audio chunks while the remaining segments are still being synthesized
+        chunks = speech_streamer.stream(text_for_tts, config.TTS_LANG, config.TTS_VOICE)
+        if config.TTS_CACHE_ENABLED:
+            chunks = audio_cache.stream_and_store(key, backend.extension, chunks)
         return StreamingResponse(
-            audio_stream(),
-            media_type="audio/mpeg",
-            headers={"Content-Disposition": "inline; filename=moderation.mp3"}
+            chunks,
+            media_type=speech_streamer.media_type,
+            headers={"Content-Disposition": f"inline; filename=moderation.{backend.extension}"}
         )
 
+    except (LLMOverloadedError, LLMUnavailableError) as e:
+        logger.warning(f"TTS moderation rejected: {e}")
+        raise classifier_unavailable(e)
     except Exception as e:
         logger.error(f"TTS moderation failed: {e}")
         raise ApiError(500, f"TTS moderation failed: {str(e)}")        
 
 
+@router.get("/tts/{key}", name="tts_audio")
+async def tts_audio(key: str, request: Request):
+    if not AUDIO_KEY_PATTERN.fullmatch(key):
+        raise ApiError(400, "Invalid audio key", errors=["Expected a 64-character hex key"])
+    path = audio_cache.get(key)
+    if path is None:
+        raise ApiError(404, "Audio not found", errors=["The audio is not cached (it may have been evicted)"])
+    return cached_audio_response(request, key, path)
+
+
 @router.post("/text", response_model=ApiResponse)
-async def moderate_text(payload: schemas.TextModerationRequest, db: Session = Depends(get_db)):
+async def moderate_text(payload: schemas.TextModerationRequest, db: AsyncSession = Depends(get_async_db)):
     if not payload.text.strip():
         logger.warning("Received empty text content for moderation")
         raise ApiError(status_code=400, message="Text content cannot be empty", errors=["Empty text is not allowed"])
     
+    content_hash = hash_string(payload.text)
+    fingerprint = simhash(normalize_text(payload.text)) if config.NEAR_DUP_ENABLED else None
+    log_key = content_hash[:12]
+
+    # Resolve the verdict first; nothing is written until it is known
+    result_data = None
+    if not payload.bypass_cache:
+        result_data = await verdict_cache.lookup(db, content_hash)
+        if result_data is not None:
+            logger.info(f"Verdict cache hit for text {log_key}")
+        elif fingerprint is not None:
+            result_data = near_duplicate_index.find(fingerprint)
+            if result_data is not None:
+                verdict_cache.set(content_hash, result_data)
+                logger.info(f"Near-duplicate verdict reused for text {log_key}")
+
+    # Hand the pooled connection back while the classifier runs
+    await db.close()
+
+    if result_data is None and config.PREFILTER_ENABLED:
+        result_data = prefilter.classify(payload.text)
+        if result_data is not None:
+            logger.info(f"Pre-filter answered text {log_key} without the LLM")
+
+    if result_data is None:
+        try:
+            if config.TEXT_BATCHING_ENABLED:
+                result_data = await text_batcher.classify(payload.text)
+            else:
+                result_data = await classify_text_gemini_async(payload.text)
+            logger.info(f"Text classification successful for text {log_key}")
+        except (LLMOverloadedError, LLMUnavailableError) as e:
+            logger.warning(f"Text classification rejected for text {log_key}: {e}")
+            raise classifier_unavailable(e)
+        except Exception as e:
+            logger.error(f"Text classification failed for text {log_key}: {e}")
+            raise ApiError(500, f"Text classification failed: {str(e)}")
+        verdict_cache.set(content_hash, result_data)
+        if fingerprint is not None:
+            near_duplicate_index.add(fingerprint, result_data)
+
+    # Request and result are inserted together in a single transaction
     req = models.ModerationRequest(
         email=payload.email,
-        content_hash=hash_string(payload.text),
+        content_hash=content_hash,
+        simhash=fingerprint_to_hex(fingerprint) if fingerprint is not None else None,
         content_type="text",
-        status="pending"
+        status="completed",
+        results=[models.ModerationResult(
+            classification=result_data.classification,
+            confidence=result_data.confidence,
+            reasoning=result_data.reason,
+            llm_response=result_data.description
+        )]
     )
-    await db_add_commit_refresh(db, req)
-    logger.info(f"Created moderation request with ID {req.id} for text content")
-
     try:
-        result_data = await asyncio.to_thread(classify_text_gemini, payload.text)
-        logger.info(f"Text classification successful for request ID {req.id}")
+        if config.WRITE_BEHIND_ENABLED:
+            await write_behind.write(req)
+        else:
+            db.add(req)
+            with timed("db_commit"):
+                await db.commit()
     except Exception as e:
-        logger.error(f"Text classification failed for request ID {req.id}: {e}")
-        raise ApiError(500, f"Text classification failed: {str(e)}")
-
-    result = models.ModerationResult(
-        request_id=req.id,
-        classification=result_data.classification,
-        confidence=result_data.confidence,
-        reasoning=result_data.reason,
-        llm_response=result_data.description
-    )
-    db.add(result)
-    req.status = "completed"
-    await db_commit(db)
-    logger.info(f"Moderation result saved and request {req.id} marked as completed")
-
-    req_with_results = await asyncio.to_thread(
-        lambda: db.query(models.ModerationRequest)
-                .options(joinedload(models.ModerationRequest.results))
-                .filter(models.ModerationRequest.id == req.id)
-                .first()
-    )
-
-    if not req_with_results.results:
-        logger.error(f"No moderation results found for request ID {req.id}")
-        raise ApiError(status_code=404, message="No moderation results found", errors=["No results for the given request"])
+        logger.error(f"Failed to save moderation result for text {log_key}: {e}")
+        raise ApiError(500, f"Failed to save moderation result: {str(e)}")
+    logger.info(f"Moderation request {req.id} saved as completed")
 
-    response_data = schemas.ModerationRequestResponse.model_validate(req_with_results)
+    response_data = schemas.ModerationRequestResponse.model_validate(req)
     return ApiResponse(
         status_code=200,
         success=True,
@@ -119,94 +217,307 @@ async def moderate_text(payload: schemas.TextModerationRequest, db: Session = De
         data=response_data
     )
 
-async def process_image_moderation_background(request_id: int, file_bytes: bytes):
-    try:
-        cloudinary_url = await upload_image_to_cloudinary(file_bytes)
-        logger.info(f"Uploaded image to Cloudinary for request ID {request_id}")
-
-        def blocking_work():
-            db = SessionLocal()
-            try:
-                result_data = classify_image_gemini(cloudinary_url)
-                logger.info(f"Image classified successfully for request ID {request_id}")
-
-                req = db.query(models.ModerationRequest).get(request_id)
-                if req is None:
-                    logger.error(f"Moderation request with ID {request_id} not found during background processing")
-                    raise ApiError(404, f"Moderation request with id {request_id} not found")
-
-                req.content_url = cloudinary_url
-                req.status = "completed"
-
-                result = models.ModerationResult(
-                    request_id=request_id,
-                    classification=result_data.classification,
-                    confidence=result_data.confidence,
-                    reasoning=result_data.reason,
-                    llm_response=result_data.description,
-                )
-                db.add(result)
-                db.commit()
-                logger.info(f"Moderation result saved and request {request_id} marked as completed in background")
-
-                # Send email notification after successful commit
-                try:
-                    email_html = moderation_email_template(
-                        request_id=request_id,
-                        classification=result_data.classification,
-                        confidence=result_data.confidence,
-                        reasoning=result_data.reason,
-                    )
-                    send_alert_email(
-                        subject="Your content moderation result is ready",
-                        html_content=email_html,
-                        to_email=req.email
-                    )
-                    logger.info(f"Moderation result email sent for request ID {request_id} to {req.email}")
-                except Exception as e:
-                    logger.error(f"Failed to send moderation email for request ID {request_id}: {e}")
-
-            except Exception as e:
-                logger.error(f"Error during blocking image moderation work for request ID {request_id}: {e}")
-                raise
-            finally:
-                db.close()
-
-        await asyncio.to_thread(blocking_work)
+@router.post("/text/batch", response_model=ApiResponse)
+async def moderate_text_batch(payload: schemas.TextBatchModerationRequest, db: AsyncSession = Depends(get_async_db)):
+    texts = payload.texts
+    if any(not text.strip() for text in texts):
+        logger.warning("Received empty text content in batch moderation")
+        raise ApiError(status_code=400, message="Text content cannot be empty", errors=["Empty text is not allowed"])
+
+    # Steps 1-3: verdict cache, near-duplicate index, pre-filter, then chunked LLM prompts
+    hashes, fingerprints, verdicts, errors = await resolve_text_verdicts(
+        db, texts, payload.bypass_cache, config.TEXT_BATCH_MAX_CONCURRENCY
+    )
+
+    # Step 4: Persist every completed item in a single unit of work
+    rows = {}
+    for index, (content_hash, fingerprint) in enumerate(zip(hashes, fingerprints)):
+        result_data = verdicts.get(content_hash)
+        if result_data is None:
+            continue
+        rows[index] = completed_request(payload.email, content_hash, fingerprint, result_data)
+
+    async def persist():
+        # add_all + one flush lets SQLAlchemy batch the INSERTs (insertmanyvalues)
+        db.add_all(rows.values())
+        await db.flush()
+        items = []
+        for index, content_hash in enumerate(hashes):
+            if index in rows:
+                items.append(schemas.BatchItemResponse(
+                    index=index,
+                    status="completed",
+                    request=schemas.ModerationRequestResponse.model_validate(rows[index])
+                ))
+            else:
+                items.append(schemas.BatchItemResponse(index=index, status="failed", error=errors.get(content_hash)))
+        with timed("db_commit"):
+            await db.commit()
+        return items
 
+    try:
+        items = await persist()
     except Exception as e:
-        logger.error(f"Error in image moderation background task for request ID {request_id}: {e}")
+        logger.error(f"Failed to persist batch moderation results: {e}")
+        raise ApiError(500, f"Batch moderation failed: {str(e)}")
 
+    failed = sum(1 for item in items if item.status == "failed")
+    logger.info(f"Batch moderation saved {len(rows)} requests ({failed} failed) for {payload.email}")
+    return ApiResponse(
+        status_code=200,
+        success=True,
+        message="Success" if not failed else f"Completed with {failed} failed items",
+        data=items
+    )
+
+class DuplexStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse for handlers that keep reading the request body while responding.
+
+    The stock response listens for a disconnect on receive() at the same
+    time (on ASGI servers before spec 2.4), which would swallow the body
+    messages the handler is still waiting for. A disconnect surfaces here
+    as a ClientDisconnect from request.stream() instead.
+    """
+
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await self.stream_response(send)
+        except OSError:
+            raise ClientDisconnect()
+
+
+@router.post("/bulk")
+async def moderate_bulk(
+    request: Request,
+    email: Optional[EmailStr] = None,
+    format: Optional[Literal["ndjson", "csv"]] = None,
+    resume: Optional[int] = None,
+    bypass_cache: bool = False,
+):
+    """
+    Stream an NDJSON or CSV upload through moderation and stream NDJSON verdicts back.
+
+    The body is parsed as it arrives. The first output line carries the run
+    id; pass it as ?resume= to continue an interrupted run after its last
+    {"checkpoint": seq} line.
+    """
+    if format is None:
+        content_type = request.headers.get("content-type", "")
+        format = "csv" if "csv" in content_type else "ndjson"
+    if resume is None and email is None:
+        raise ApiError(400, "Email is required", errors=["Pass ?email= for a new bulk ingest run"])
+
+    async with AsyncSessionLocal() as db:
+        try:
+            run = await start_run(db, email, format, resume)
+        except LookupError as e:
+            raise ApiError(404, "Bulk ingest run not found", errors=[str(e)])
+        except BulkInputError as e:
+            raise ApiError(400, "Format does not match the resumed run", errors=[str(e)])
+        except ValueError as e:
+            raise ApiError(409, "Bulk ingest run cannot be resumed", errors=[str(e)])
+
+    async def ndjson_lines():
+        async for line in ingest(run, parse_items(request.stream(), format), bypass_cache):
+            yield json.dumps(line) + "\n"
+
+    logger.info(f"Bulk ingest run {run.id} started for {run.email} ({format}, after item {run.checkpoint})")
+    return DuplexStreamingResponse(
+        ndjson_lines(),
+        media_type="application/x-ndjson",
+        headers={"X-Bulk-Run-Id": str(run.id)}
+    )
 
 @router.post("/image", response_model=ApiResponse)
 async def moderate_image(
     email: EmailStr = Form(...),
     file: UploadFile = File(...),
-    db: Session = Depends(get_db),
-    background_tasks: BackgroundTasks = None
+    db: AsyncSession = Depends(get_async_db)
 ):
-    file_bytes = await file.read()
+    try:
+        payload_path, content_hash, size = await spool_upload(
+            file,
+            config.JOB_SPOOL_DIR,
+            max_bytes=config.MAX_IMAGE_BYTES,
+            chunk_size=config.UPLOAD_CHUNK_SIZE
+        )
+    except PayloadTooLargeError as e:
+        logger.warning(f"Rejected oversized image upload from user {email}")
+        raise ApiError(413, "Image file is too large", errors=[str(e)])
 
-    if not file_bytes:
+    if size == 0:
+        remove_spool_file(payload_path)
         logger.warning(f"No image file provided for moderation by user {email}")
         raise ApiError(400, "No image file provided", errors=["Empty file"])
 
-    req = models.ModerationRequest(
-        email=email,
-        content_type="image",
-        status="pending"
-    )
-    db.add(req)
-    db.commit()
-    db.refresh(req)
-    logger.info(f"Created moderation request with ID {req.id} for image content")
+    async def create_request_and_job():
+        req = models.ModerationRequest(
+            email=email,
+            content_type="image",
+            content_hash=content_hash,
+            status="pending"
+        )
+        db.add(req)
+        await db.flush()
+        enqueue_job(db, req.id, payload_path)
+        with timed("db_commit"):
+            await db.commit()
+        return req.id
 
-    background_tasks.add_task(process_image_moderation_background, req.id, file_bytes)
-    logger.info(f"Background task started for image moderation request ID {req.id}")
+    try:
+        request_id = await create_request_and_job()
+    except Exception:
+        remove_spool_file(payload_path)
+        raise
+    logger.info(f"Created moderation request with ID {request_id} and queued image moderation job")
 
     return ApiResponse(
         status_code=200,
         success=True,
         message="Moderation processing started",
-        data={"request_id": req.id}
+        data={"request_id": request_id}
+    )
+
+
+@router.get("/stats", response_model=ApiResponse)
+async def moderation_stats(db: AsyncSession = Depends(get_async_db)):
+    job_queue = await db.run_sync(queue_stats)
+    return ApiResponse(
+        status_code=200,
+        success=True,
+        message="Success",
+        data={
+            "verdict_cache": verdict_cache.stats(),
+            "near_duplicate_index": near_duplicate_index.stats(),
+            "image_hash_index": image_hash_index.stats(),
+            "text_batcher": text_batcher.stats(),
+            "write_behind": write_behind.stats(),
+            "llm_limiter": llm_limiter.stats(),
+            "llm_breaker": llm_breaker.stats(),
+            "prefilter": prefilter.stats(),
+            "job_queue": job_queue,
+            "job_workers": in_process_workers.stats(),
+            "notification_rate_limits": {channel: bucket.stats() for channel, bucket in channel_limiters.items()},
+            "email": email_dispatcher.stats(),
+            "tts": speech_streamer.stats(),
+            "tts_cache": audio_cache.stats(),
+            "request_events": request_events.stats(),
+            "stage_latency_seconds": stage_latency.snapshot(),
+            "llm_tokens": llm_tokens.snapshot(),
+        }
+    )
+
+
+async def load_request_status(db: AsyncSession, request_id: int):
+    req = await db.scalar(
+        select(models.ModerationRequest)
+        .options(selectinload(models.ModerationRequest.results))
+        .where(models.ModerationRequest.id == request_id)
+    )
+    if req is None:
+        return None
+    job = await db.scalar(
+        select(models.ModerationJob)
+        .where(models.ModerationJob.request_id == request_id, models.ModerationJob.kind == "image")
+        .order_by(models.ModerationJob.id.desc())
+        .limit(1)
+    )
+    status = schemas.ModerationStatusResponse.model_validate(req)
+    if job is not None:
+        status.job = schemas.JobStatusResponse.model_validate(job)
+    return status
+
+
+def is_final(status: schemas.ModerationStatusResponse) -> bool:
+    return status.status == "completed" or (status.job is not None and status.job.status == "dead")
+
+
+async def watch_request_status(request_id: int):
+    """
+    Yield the request's status whenever it changes, until it is final or the
+    subscription times out. Yields None on each quiet poll interval (a heartbeat).
+
+    Completions in this process arrive through request_events within
+    milliseconds; the periodic re-read covers workers in other processes.
+    """
+    deadline = time.monotonic() + config.MODERATION_EVENTS_TIMEOUT_SECONDS
+    last = None
+    # Subscribe before the first read so a completion in between is not missed
+    with request_events.subscribe(request_id) as subscription:
+        while True:
+            async with AsyncSessionLocal() as db:
+                status = await load_request_status(db, request_id)
+            if status is None:
+                return
+            if status != last:
+                last = status
+                yield status
+                if is_final(status):
+                    return
+            else:
+                yield None
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            await subscription.wait(min(config.MODERATION_EVENTS_POLL_SECONDS, remaining))
+
+
+async def ensure_request_exists(db: AsyncSession, request_id: int) -> None:
+    if await db.get(models.ModerationRequest, request_id) is None:
+        raise ApiError(404, "Moderation request not found", errors=[f"No moderation request with id {request_id}"])
+
+
+@router.get("/{request_id}", response_model=ApiResponse)
+async def moderation_status(request_id: int, db: AsyncSession = Depends(get_async_db)):
+    status = await load_request_status(db, request_id)
+    if status is None:
+        raise ApiError(404, "Moderation request not found", errors=[f"No moderation request with id {request_id}"])
+    return ApiResponse(
+        status_code=200,
+        success=True,
+        message="Success",
+        data=status
     )
+
+
+@router.get("/{request_id}/events")
+async def moderation_events(request_id: int, db: AsyncSession = Depends(get_async_db)):
+    await ensure_request_exists(db, request_id)
+
+    async def event_stream():
+        async for status in watch_request_status(request_id):
+            if status is None:
+                yield ": keepalive\n\n"
+                continue
+            event = "final" if is_final(status) else "status"
+            yield f"event: {event}\ndata: {json.dumps(status.model_dump(mode='json'))}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.websocket("/{request_id}/ws")
+async def moderation_websocket(websocket: WebSocket, request_id: int):
+    await websocket.accept()
+    async with AsyncSessionLocal() as db:
+        exists = await db.get(models.ModerationRequest, request_id) is not None
+    if not exists:
+        await websocket.send_json({"event": "error", "message": f"No moderation request with id {request_id}"})
+        await websocket.close(code=1008)
+        return
+
+    try:
+        async for status in watch_request_status(request_id):
+            if status is None:
+                # Heartbeats also detect subscribers that went away
+                await websocket.send_json({"event": "keepalive"})
+                continue
+            event = "final" if is_final(status) else "status"
+            await websocket.send_json({"event": event, "data": status.model_dump(mode="json")})
+        await websocket.close()
+    except WebSocketDisconnect:
+        logger.info(f"Status subscriber for request ID {request_id} disconnected")
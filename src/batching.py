@@ -0,0 +1,167 @@
+import asyncio
+import time
+from typing import Awaitable, Callable, List, Optional
+
+from src.config import config
+from src.llm_classifier import classify_text_gemini_async, classify_texts_gemini_async
+from src.logger import logger
+from src.metrics import Histogram
+from src.schemas import ModerationResult
+
+_STOP = object()
+
+
+class TextBatcher:
+    """
+    Coalesces concurrent single-text classifications into multi-item prompts.
+
+    Callers await classify(); a background loop collects queued texts for up
+    to max_wait_ms or max_batch_size items, sends them as one prompt and
+    resolves each caller's future with its own verdict. At most
+    max_inflight batches are sent to the classifier at the same time.
+    """
+
+    def __init__(
+        self,
+        classify_one: Callable[[str], Awaitable[ModerationResult]],
+        classify_many: Callable[[List[str]], Awaitable[List[Optional[ModerationResult]]]],
+        max_wait_ms: float,
+        max_batch_size: int,
+        max_inflight: int,
+    ):
+        self.classify_one = classify_one
+        self.classify_many = classify_many
+        self.max_wait = max_wait_ms / 1000
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_inflight = max(1, max_inflight)
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._inflight: Optional[asyncio.Semaphore] = None
+        self._loop_task: Optional[asyncio.Task] = None
+        self._batch_tasks: set = set()
+
+        self.batch_size_histogram = Histogram([1, 2, 4, 8, 16, 32, 64])
+        self.queue_depth_histogram = Histogram([0, 1, 5, 10, 25, 50, 100, 250])
+        self.batches = 0
+        self.items = 0
+
+    def start(self) -> None:
+        if self._loop_task is not None and not self._loop_task.done():
+            return
+        self._queue = asyncio.Queue()
+        self._inflight = asyncio.Semaphore(self.max_inflight)
+        self._loop_task = asyncio.create_task(self._run())
+        logger.info(
+            f"Text batcher started (max_wait={self.max_wait * 1000:.0f}ms, "
+            f"max_batch_size={self.max_batch_size}, max_inflight={self.max_inflight})"
+        )
+
+    async def stop(self) -> None:
+        """
+        Stop the collection loop, classify everything still queued and wait for in-flight batches.
+        """
+        if self._loop_task is None:
+            return
+        # A sentinel rather than cancel(), so a batch being collected or waiting for a slot is not lost
+        self._queue.put_nowait(_STOP)
+        await self._loop_task
+        self._loop_task = None
+
+        # Drain anything queued behind the sentinel so no caller is left waiting
+        leftover = []
+        while not self._queue.empty():
+            item = self._queue.get_nowait()
+            if item is not _STOP:
+                leftover.append(item)
+        for offset in range(0, len(leftover), self.max_batch_size):
+            await self._dispatch(leftover[offset:offset + self.max_batch_size])
+        if self._batch_tasks:
+            await asyncio.gather(*self._batch_tasks, return_exceptions=True)
+
+    async def classify(self, text: str) -> ModerationResult:
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((text, future))
+        return await future
+
+    async def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is _STOP:
+                return
+            batch = [item]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            await self._dispatch(batch)
+
+    async def _dispatch(self, batch) -> None:
+        self.queue_depth_histogram.observe(self._queue.qsize())
+        self.batch_size_histogram.observe(len(batch))
+        self.batches += 1
+        self.items += len(batch)
+
+        await self._inflight.acquire()
+        task = asyncio.create_task(self._classify_batch(batch))
+        self._batch_tasks.add(task)
+        task.add_done_callback(self._batch_tasks.discard)
+
+    async def _classify_batch(self, batch) -> None:
+        try:
+            texts = [text for text, _ in batch]
+            if len(texts) == 1:
+                results = [await self.classify_one(texts[0])]
+            else:
+                results = await self.classify_many(texts)
+
+            # Texts the multi-item answer skipped fall back to single prompts
+            retries = [(text, future) for (text, future), result in zip(batch, results) if result is None]
+            retried = await asyncio.gather(*(self.classify_one(text) for text, _ in retries), return_exceptions=True)
+            fallback = {id(future): result for (_, future), result in zip(retries, retried)}
+
+            for (_, future), result in zip(batch, results):
+                if future.done():
+                    continue
+                if result is None:
+                    result = fallback[id(future)]
+                if isinstance(result, BaseException):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+        except Exception as e:
+            logger.error(f"Text batch of {len(batch)} items failed: {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            self._inflight.release()
+
+    def stats(self) -> dict:
+        return {
+            "enabled": config.TEXT_BATCHING_ENABLED,
+            "batches": self.batches,
+            "items": self.items,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "batch_size": self.batch_size_histogram.snapshot(),
+            "queue_depth_at_dispatch": self.queue_depth_histogram.snapshot(),
+        }
+
+
+text_batcher = TextBatcher(
+    classify_one=classify_text_gemini_async,
+    classify_many=classify_texts_gemini_async,
+    max_wait_ms=config.TEXT_BATCHING_MAX_WAIT_MS,
+    max_batch_size=config.TEXT_BATCHING_MAX_SIZE,
+    max_inflight=config.TEXT_BATCHING_MAX_INFLIGHT,
+)
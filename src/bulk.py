@@ -0,0 +1,478 @@
+import argparse
+import asyncio
+import codecs
+import csv
+import json
+import sys
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from pydantic import EmailStr, TypeAdapter, ValidationError
+from sqlalchemy import and_, or_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src import models, schemas
+from src.cache import verdict_cache
+from src.config import config
+from src.database import AsyncSessionLocal
+from src.jobs import utcnow
+from src.llm_classifier import classify_texts_gemini_async
+from src.logger import logger
+from src.metrics import timed
+from src.near_duplicate import near_duplicate_index, normalize_text, simhash, fingerprint_to_hex
+from src.prefilter import prefilter
+from src.utils import hash_string
+
+BULK_FORMATS = ("ndjson", "csv")
+MAX_TEXT_LENGTH = 5000
+EMAIL_ADAPTER = TypeAdapter(EmailStr)
+
+_DONE = object()
+
+
+class BulkInputError(ValueError):
+    """
+    The upload cannot be parsed at all (as opposed to a single bad item).
+    """
+
+
+@dataclass
+class BulkItem:
+    seq: int
+    text: Optional[str] = None
+    external_id: Optional[str] = None
+    email: Optional[str] = None
+    error: Optional[str] = None
+
+
+async def resolve_text_verdicts(
+    db: AsyncSession,
+    texts: List[str],
+    bypass_cache: bool,
+    max_concurrency: int,
+) -> Tuple[List[str], List[Optional[int]], Dict[str, schemas.ModerationResult], Dict[str, str]]:
+    """
+    Resolve verdicts for a list of texts: verdict cache, near-duplicate index,
+    pre-filter, then the remaining unique texts in multi-item prompts.
+
+    Returns (hashes, fingerprints, verdicts by hash, errors by hash).
+    """
+    hashes = [hash_string(text) for text in texts]
+    fingerprints = [
+        simhash(normalize_text(text)) if config.NEAR_DUP_ENABLED else None
+        for text in texts
+    ]
+
+    # Step 1: Resolve what we can from the verdict cache and near-duplicate index
+    verdicts = {}
+    if not bypass_cache:
+        verdicts = await verdict_cache.lookup_many(db, hashes)
+        for content_hash, fingerprint in zip(hashes, fingerprints):
+            if content_hash in verdicts or fingerprint is None:
+                continue
+            near_match = near_duplicate_index.find(fingerprint)
+            if near_match is not None:
+                verdicts[content_hash] = near_match
+                verdict_cache.set(content_hash, near_match)
+
+    # Step 2: Let the local pre-filter answer the obvious ones
+    if config.PREFILTER_ENABLED:
+        for text, content_hash in zip(texts, hashes):
+            if content_hash not in verdicts:
+                prefiltered = prefilter.classify(text)
+                if prefiltered is not None:
+                    verdicts[content_hash] = prefiltered
+
+    # Step 3: Classify the remaining unique texts in chunks, one prompt per chunk
+    pending = {}
+    for text, content_hash, fingerprint in zip(texts, hashes, fingerprints):
+        if content_hash not in verdicts:
+            pending.setdefault(content_hash, (text, fingerprint))
+    pending_items = list(pending.items())
+    chunk_size = max(1, config.TEXT_BATCH_CHUNK_SIZE)
+    chunks = [pending_items[i:i + chunk_size] for i in range(0, len(pending_items), chunk_size)]
+    errors = {}
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+    async def classify_chunk(chunk):
+        async with semaphore:
+            try:
+                results = await classify_texts_gemini_async([text for _, (text, _) in chunk])
+            except Exception as e:
+                logger.error(f"Batch classification chunk of {len(chunk)} texts failed: {e}")
+                for content_hash, _ in chunk:
+                    errors[content_hash] = f"Text classification failed: {str(e)}"
+                return
+        for (content_hash, (_, fingerprint)), result_data in zip(chunk, results):
+            if result_data is None:
+                errors[content_hash] = "Classifier returned no valid result for this item"
+                continue
+            verdicts[content_hash] = result_data
+            verdict_cache.set(content_hash, result_data)
+            if fingerprint is not None:
+                near_duplicate_index.add(fingerprint, result_data)
+
+    await asyncio.gather(*(classify_chunk(chunk) for chunk in chunks))
+    if pending_items:
+        logger.info(f"Classified {len(pending_items)} unique texts in {len(chunks)} chunks for {len(texts)} items")
+    return hashes, fingerprints, verdicts, errors
+
+
+def completed_request(email: str, content_hash: str, fingerprint: Optional[int], result_data) -> models.ModerationRequest:
+    return models.ModerationRequest(
+        email=email,
+        content_hash=content_hash,
+        simhash=fingerprint_to_hex(fingerprint) if fingerprint is not None else None,
+        content_type="text",
+        status="completed",
+        results=[models.ModerationResult(
+            classification=result_data.classification,
+            confidence=result_data.confidence,
+            reasoning=result_data.reason,
+            llm_response=result_data.description
+        )]
+    )
+
+
+async def iter_lines(chunks: AsyncIterator[bytes], max_line_bytes: int) -> AsyncIterator[str]:
+    """
+    Split a byte stream into decoded lines without buffering more than one line.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    buffer = ""
+    async for chunk in chunks:
+        buffer += decoder.decode(chunk)
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+        if len(buffer) > max_line_bytes:
+            raise BulkInputError(f"Line longer than {max_line_bytes} bytes")
+    buffer += decoder.decode(b"", final=True)
+    if buffer:
+        yield buffer.rstrip("\r")
+
+
+def _item(seq: int, text, external_id, email) -> BulkItem:
+    if not isinstance(text, str) or not text.strip():
+        return BulkItem(seq, external_id=external_id, error="Missing or empty 'text'")
+    if len(text) > MAX_TEXT_LENGTH:
+        return BulkItem(seq, external_id=external_id, error=f"Text longer than {MAX_TEXT_LENGTH} characters")
+    if email:
+        try:
+            email = EMAIL_ADAPTER.validate_python(email)
+        except ValidationError:
+            return BulkItem(seq, external_id=external_id, error=f"Invalid email '{email}'")
+    return BulkItem(seq, text=text, external_id=external_id, email=email or None)
+
+
+async def parse_ndjson(lines: AsyncIterator[str]) -> AsyncIterator[BulkItem]:
+    """
+    One JSON object per line with "text" and optional "id" and "email"; blank lines are skipped.
+    """
+    seq = 0
+    async for line in lines:
+        if not line.strip():
+            continue
+        seq += 1
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield BulkItem(seq, error=f"Invalid JSON: {e}")
+            continue
+        if not isinstance(record, dict):
+            yield BulkItem(seq, error="Expected a JSON object")
+            continue
+        external_id = record.get("id")
+        yield _item(seq, record.get("text"), str(external_id) if external_id is not None else None, record.get("email"))
+
+
+async def parse_csv(lines: AsyncIterator[str]) -> AsyncIterator[BulkItem]:
+    """
+    CSV with a header row containing "text" and optionally "id" and "email".
+
+    Quoted fields may span lines; a record is parsed once its quotes balance.
+    """
+    header = None
+    record_lines: List[str] = []
+    seq = 0
+    async for line in lines:
+        record_lines.append(line)
+        if sum(part.count('"') for part in record_lines) % 2:
+            if sum(len(part) for part in record_lines) > config.BULK_MAX_LINE_BYTES:
+                raise BulkInputError(f"CSV record longer than {config.BULK_MAX_LINE_BYTES} bytes")
+            continue
+        raw = "\n".join(record_lines)
+        record_lines = []
+        if not raw.strip():
+            continue
+        row = next(csv.reader([raw]))
+        if header is None:
+            header = [name.strip().lower() for name in row]
+            if "text" not in header:
+                raise BulkInputError("CSV header must include a 'text' column")
+            continue
+        seq += 1
+        if len(row) != len(header):
+            yield BulkItem(seq, error=f"Expected {len(header)} columns, got {len(row)}")
+            continue
+        record = dict(zip(header, row))
+        yield _item(seq, record.get("text"), record.get("id") or None, record.get("email"))
+    if record_lines:
+        seq += 1
+        yield BulkItem(seq, error="Unterminated quoted field at end of input")
+
+
+def parse_items(chunks: AsyncIterator[bytes], format: str) -> AsyncIterator[BulkItem]:
+    lines = iter_lines(chunks, config.BULK_MAX_LINE_BYTES)
+    return parse_csv(lines) if format == "csv" else parse_ndjson(lines)
+
+
+async def start_run(db: AsyncSession, email: str, format: str, resume_id: Optional[int]) -> models.BulkIngestRun:
+    """
+    Create a new ingest run, or reopen an interrupted one to continue after its checkpoint.
+
+    A resume claims the run with a single conditional UPDATE, so a format
+    mismatch leaves it untouched and two uploads cannot resume it at once.
+    A run still marked "running" can only be taken over once its checkpoint
+    heartbeat is older than BULK_RUN_STALE_SECONDS (its process died).
+    """
+    if resume_id is None:
+        run = models.BulkIngestRun(email=email, format=format, status="running", checkpoint=0)
+        db.add(run)
+        await db.commit()
+        return run
+
+    Run = models.BulkIngestRun
+    stale_before = utcnow() - timedelta(seconds=config.BULK_RUN_STALE_SECONDS)
+    claimed = await db.execute(
+        update(Run)
+        .where(
+            Run.id == resume_id,
+            Run.format == format,
+            or_(Run.status == "interrupted", and_(Run.status == "running", Run.updated_at < stale_before)),
+        )
+        .values(status="running", updated_at=utcnow())
+    )
+    if claimed.rowcount == 0:
+        await db.rollback()
+        run = await db.get(Run, resume_id)
+        if run is None:
+            raise LookupError(f"Bulk ingest run {resume_id} not found")
+        if run.format != format:
+            raise BulkInputError(f"Bulk ingest run {resume_id} was started as {run.format}, not {format}")
+        raise ValueError(f"Bulk ingest run {resume_id} is already {run.status}")
+    await db.commit()
+    return await db.get(Run, resume_id, populate_existing=True)
+
+
+async def ingest(
+    run: models.BulkIngestRun,
+    items: AsyncIterator[BulkItem],
+    bypass_cache: bool = False,
+) -> AsyncIterator[dict]:
+    """
+    Moderate a stream of items and yield one NDJSON-ready dict per verdict as it finishes.
+
+    Items are read in chunks of BULK_CHUNK_SIZE through bounded queues, so
+    at most BULK_MAX_CONCURRENCY chunks are in flight and memory does not
+    grow with the input. Verdicts are yielded in completion order, but rows
+    are committed in input order together with the run's checkpoint, so a
+    resumed run skips exactly the items that were already stored. A
+    {"checkpoint": seq} line follows every commit.
+    """
+    concurrency = max(1, config.BULK_MAX_CONCURRENCY)
+    chunk_size = max(1, config.BULK_CHUNK_SIZE)
+    chunks: asyncio.Queue = asyncio.Queue(concurrency)
+    outcomes: asyncio.Queue = asyncio.Queue(concurrency * chunk_size * 2)
+    resume_after = run.checkpoint
+
+    async def read():
+        chunk = []
+        async for item in items:
+            if item.seq <= resume_after:
+                continue
+            chunk.append(item)
+            if len(chunk) >= chunk_size:
+                await chunks.put(chunk)
+                chunk = []
+        if chunk:
+            await chunks.put(chunk)
+
+    async def classify():
+        while True:
+            chunk = await chunks.get()
+            if chunk is _DONE:
+                return
+            valid = [item for item in chunk if item.error is None]
+            verdicts, errors, hashes, fingerprints = {}, {}, [], []
+            chunk_error = None
+            if valid:
+                try:
+                    async with AsyncSessionLocal() as db:
+                        hashes, fingerprints, verdicts, errors = await resolve_text_verdicts(
+                            db, [item.text for item in valid], bypass_cache, max_concurrency=1
+                        )
+                except Exception as e:
+                    logger.error(f"Bulk ingest run {run.id} chunk failed: {e}")
+                    chunk_error = f"Text classification failed: {str(e)}"
+            resolved = {
+                item.seq: (content_hash, fingerprint)
+                for item, content_hash, fingerprint in zip(valid, hashes, fingerprints)
+            }
+            for item in chunk:
+                content_hash, fingerprint = resolved.get(item.seq, (None, None))
+                result_data = verdicts.get(content_hash)
+                error = item.error or errors.get(content_hash) or chunk_error
+                await outcomes.put((item, content_hash, fingerprint, result_data, error))
+
+    async def produce():
+        workers = [asyncio.create_task(classify()) for _ in range(concurrency)]
+        try:
+            read_error = None
+            try:
+                await read()
+            except Exception as e:
+                read_error = e
+            # Let the workers finish the chunks already read, then end the outcome stream
+            for _ in workers:
+                await chunks.put(_DONE)
+            results = await asyncio.gather(*workers, return_exceptions=True)
+            await outcomes.put(_DONE)
+        except asyncio.CancelledError:
+            # The consumer went away: nobody drains the queues, so stop the workers outright
+            for worker in workers:
+                worker.cancel()
+            raise
+        for error in [read_error, *results]:
+            if isinstance(error, Exception):
+                raise error
+
+    producer = asyncio.create_task(produce())
+    # Finished items waiting for every earlier item, so rows are stored in input order
+    finished: Dict[int, tuple] = {}
+    next_seq = resume_after + 1
+    ready: List[tuple] = []
+
+    async def commit(rows: List[tuple]) -> int:
+        checkpoint = rows[-1][0].seq
+        completed = sum(1 for row in rows if row[3] is not None)
+        async with AsyncSessionLocal() as db:
+            db.add_all([
+                completed_request(item.email or run.email, content_hash, fingerprint, result_data)
+                for item, content_hash, fingerprint, result_data, _ in rows
+                if result_data is not None
+            ])
+            stored = await db.get(models.BulkIngestRun, run.id)
+            stored.checkpoint = checkpoint
+            stored.completed_items += completed
+            stored.failed_items += len(rows) - completed
+            stored.updated_at = utcnow()
+            with timed("db_commit"):
+                await db.commit()
+        run.checkpoint = checkpoint
+        return checkpoint
+
+    finished_ok = False
+    try:
+        yield {"run_id": run.id, "resume_after": resume_after}
+        while True:
+            outcome = await outcomes.get()
+            if outcome is _DONE:
+                break
+            item, _, _, result_data, error = outcome
+            line = {"seq": item.seq, "id": item.external_id}
+            if result_data is not None:
+                line.update(status="completed", result=result_data.model_dump())
+            else:
+                line.update(status="failed", error=error or "Classifier returned no valid result for this item")
+            yield line
+
+            finished[item.seq] = outcome
+            while next_seq in finished:
+                ready.append(finished.pop(next_seq))
+                next_seq += 1
+            if len(ready) >= config.BULK_PERSIST_BATCH:
+                yield {"checkpoint": await commit(ready)}
+                ready = []
+
+        try:
+            await producer
+        except BulkInputError as e:
+            logger.warning(f"Bulk ingest run {run.id} stopped on unreadable input: {e}")
+            yield {"error": str(e)}
+        else:
+            finished_ok = True
+        # Everything that finished in order is stored, even when the input broke off
+        if ready:
+            yield {"checkpoint": await commit(ready)}
+            ready = []
+    finally:
+        if not producer.done():
+            producer.cancel()
+            try:
+                await producer
+            except (asyncio.CancelledError, Exception):
+                pass
+        async with AsyncSessionLocal() as db:
+            stored = await db.get(models.BulkIngestRun, run.id)
+            stored.status = "completed" if finished_ok else "interrupted"
+            stored.updated_at = utcnow()
+            await db.commit()
+            summary = {
+                "done": finished_ok,
+                "checkpoint": stored.checkpoint,
+                "completed_items": stored.completed_items,
+                "failed_items": stored.failed_items,
+            }
+        logger.info(f"Bulk ingest run {run.id} {'completed' if finished_ok else 'interrupted'} at item {summary['checkpoint']}")
+    yield summary
+
+
+async def read_file_chunks(path: str, chunk_size: int = 256 * 1024) -> AsyncIterator[bytes]:
+    handle = await asyncio.to_thread(open, path, "rb")
+    try:
+        while True:
+            chunk = await asyncio.to_thread(handle.read, chunk_size)
+            if not chunk:
+                return
+            yield chunk
+    finally:
+        handle.close()
+
+
+async def run_cli(path: str, email: str, format: str, resume_id: Optional[int], bypass_cache: bool, output) -> int:
+    from src.database import engine
+    from src.migrations import upgrade_schema
+    import src.rollups  # noqa: F401  keeps analytics rollups current for the ingested rows
+
+    upgrade_schema(engine)
+    async with AsyncSessionLocal() as db:
+        run = await start_run(db, email, format, resume_id)
+    print(f"Bulk ingest run {run.id} (resume with --resume {run.id})", file=sys.stderr)
+
+    done = False
+    async for line in ingest(run, parse_items(read_file_chunks(path), format), bypass_cache):
+        output.write(json.dumps(line) + "\n")
+        output.flush()
+        done = line.get("done", done)
+    return 0 if done else 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Moderate an NDJSON or CSV file of texts and write NDJSON verdicts")
+    parser.add_argument("path", help="input file (NDJSON lines or CSV with a 'text' column)")
+    parser.add_argument("--email", required=True, help="owner of the stored requests (rows may override it)")
+    parser.add_argument("--format", choices=BULK_FORMATS, help="defaults to the file extension")
+    parser.add_argument("--resume", type=int, help="continue an interrupted run after its checkpoint")
+    parser.add_argument("--bypass-cache", action="store_true")
+    parser.add_argument("--output", help="write verdicts here instead of stdout")
+    args = parser.parse_args()
+
+    input_format = args.format or ("csv" if args.path.lower().endswith(".csv") else "ndjson")
+    output = open(args.output, "a", encoding="utf-8") if args.output else sys.stdout
+    try:
+        sys.exit(asyncio.run(run_cli(args.path, args.email, input_format, args.resume, args.bypass_cache, output)))
+    finally:
+        if output is not sys.stdout:
+            output.close()
@@ -0,0 +1,166 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+from typing import Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src import models, schemas
+from src.config import config
+
+
+def verdict_from_result(row: models.ModerationResult, content_type: str) -> schemas.ModerationResult:
+    """
+    Rebuild a classifier verdict from a stored ModerationResult row.
+    """
+    return schemas.ModerationResult(
+        content_type=content_type,
+        classification=row.classification,
+        confidence=row.confidence,
+        reason=row.reasoning or "",
+        description=row.llm_response or "",
+    )
+
+
+class VerdictCache:
+    """
+    Two-tier cache of text verdicts keyed by the SHA-256 content hash.
+
+    The first tier is an in-process LRU with TTL and size-based eviction.
+    On a miss it falls back to the most recent stored ModerationResult for
+    the same content hash.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float, db_lookback_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.db_lookback_seconds = db_lookback_seconds
+        self._entries: "OrderedDict[str, tuple[float, schemas.ModerationResult]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, content_hash: str) -> Optional[schemas.ModerationResult]:
+        """
+        Return the cached verdict for a content hash from the in-process tier.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(content_hash)
+            if entry is None:
+                return None
+            expires_at, result = entry
+            if expires_at < now:
+                del self._entries[content_hash]
+                self.evictions += 1
+                return None
+            self._entries.move_to_end(content_hash)
+            return result
+
+    def set(self, content_hash: str, result: schemas.ModerationResult) -> None:
+        """
+        Store a verdict in the in-process tier, evicting the least recently used entries.
+        """
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[content_hash] = (time.monotonic() + self.ttl_seconds, result)
+            self._entries.move_to_end(content_hash)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def _recent_verdicts_stmt(self, content_hashes: list[str]):
+        since = models.utcnow() - timedelta(seconds=self.db_lookback_seconds)
+        return (
+            select(models.ModerationRequest.content_hash, models.ModerationResult)
+            .join(models.ModerationResult, models.ModerationResult.request_id == models.ModerationRequest.id)
+            .where(
+                models.ModerationRequest.content_hash.in_(content_hashes),
+                models.ModerationRequest.content_type == "text",
+                models.ModerationRequest.created_at >= since,
+            )
+            .order_by(models.ModerationRequest.created_at.desc())
+        )
+
+    @staticmethod
+    def _latest_by_hash(rows) -> dict[str, schemas.ModerationResult]:
+        found = {}
+        for content_hash, row in rows:
+            found.setdefault(content_hash, verdict_from_result(row, "text"))
+        return found
+
+    async def lookup_db_many(self, db: AsyncSession, content_hashes: list[str]) -> dict[str, schemas.ModerationResult]:
+        """
+        Find the most recent stored text verdict for each of several content hashes in one query.
+        """
+        if not content_hashes:
+            return {}
+        stmt = self._recent_verdicts_stmt(content_hashes)
+        if len(content_hashes) == 1:
+            stmt = stmt.limit(1)
+        return self._latest_by_hash((await db.execute(stmt)).all())
+
+    async def lookup_many(self, db: AsyncSession, content_hashes: list[str]) -> dict[str, schemas.ModerationResult]:
+        """
+        Batch variant of lookup(); returns only the hashes that were found.
+        """
+        found = {}
+        missing = []
+        for content_hash in dict.fromkeys(content_hashes):
+            result = self.get(content_hash)
+            if result is not None:
+                self.memory_hits += 1
+                found[content_hash] = result
+            else:
+                missing.append(content_hash)
+
+        from_db = await self.lookup_db_many(db, missing)
+        for content_hash, result in from_db.items():
+            self.set(content_hash, result)
+        self.db_hits += len(from_db)
+        self.misses += len(missing) - len(from_db)
+        found.update(from_db)
+        return found
+
+    async def lookup(self, db: AsyncSession, content_hash: str) -> Optional[schemas.ModerationResult]:
+        """
+        Look up a verdict in memory first, then in previously stored results.
+        """
+        result = self.get(content_hash)
+        if result is not None:
+            self.memory_hits += 1
+            return result
+
+        result = (await self.lookup_db_many(db, [content_hash])).get(content_hash)
+        if result is not None:
+            self.db_hits += 1
+            self.set(content_hash, result)
+            return result
+
+        self.misses += 1
+        return None
+
+    def stats(self) -> dict:
+        lookups = self.memory_hits + self.db_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "memory_hits": self.memory_hits,
+            "db_hits": self.db_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": (self.memory_hits + self.db_hits) / lookups if lookups else 0.0,
+        }
+
+
+verdict_cache = VerdictCache(
+    max_entries=config.VERDICT_CACHE_MAX_ENTRIES,
+    ttl_seconds=config.VERDICT_CACHE_TTL_SECONDS,
+    db_lookback_seconds=config.VERDICT_CACHE_DB_LOOKBACK_SECONDS,
+)
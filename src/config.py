@@ -14,14 +14,140 @@ class Config:
         self.GEMINI_MODEL = os.getenv("GEMINI_MODEL")
         self.GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 
+        # Gemini concurrency limits for the async classifier path
+        self.LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "64"))
+        self.LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", "256"))
+        self.LLM_RETRY_AFTER_SECONDS = float(os.getenv("LLM_RETRY_AFTER_SECONDS", "2"))
+
+        # Gemini deadlines, retries and circuit breaker
+        self.LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "20"))
+        self.LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+        self.LLM_RETRY_BASE_DELAY_SECONDS = float(os.getenv("LLM_RETRY_BASE_DELAY_SECONDS", "0.5"))
+        self.LLM_RETRY_MAX_DELAY_SECONDS = float(os.getenv("LLM_RETRY_MAX_DELAY_SECONDS", "5"))
+        self.LLM_BREAKER_FAILURE_THRESHOLD = int(os.getenv("LLM_BREAKER_FAILURE_THRESHOLD", "5"))
+        self.LLM_BREAKER_RESET_SECONDS = float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30"))
+
         # Brevo (email service)
         self.BREVO_API_KEY = os.getenv("BREVO_API_KEY")
 
         # Email sender address (example)
         self.EMAIL_SENDER = os.getenv("EMAIL_SENDER", "default@example.com")
 
+        # Email transport (brevo, smtp, recording or null) and batched delivery
+        self.EMAIL_TRANSPORT = os.getenv("EMAIL_TRANSPORT", "brevo").lower()
+        self.EMAIL_MAX_CONNECTIONS = int(os.getenv("EMAIL_MAX_CONNECTIONS", "10"))
+        self.EMAIL_TIMEOUT_SECONDS = float(os.getenv("EMAIL_TIMEOUT_SECONDS", "10"))
+        self.EMAIL_BATCH_MAX_WAIT_MS = float(os.getenv("EMAIL_BATCH_MAX_WAIT_MS", "50"))
+        self.EMAIL_BATCH_MAX_SIZE = int(os.getenv("EMAIL_BATCH_MAX_SIZE", "100"))
+        self.SMTP_HOST = os.getenv("SMTP_HOST", "localhost")
+        self.SMTP_PORT = int(os.getenv("SMTP_PORT", "1025"))
+        self.SMTP_USERNAME = os.getenv("SMTP_USERNAME")
+        self.SMTP_PASSWORD = os.getenv("SMTP_PASSWORD")
+        self.SMTP_USE_TLS = os.getenv("SMTP_USE_TLS", "false").lower() == "true"
+
+        # Text-to-speech backend (gtts, local or 'package.module:callable') and streaming
+        self.TTS_BACKEND = os.getenv("TTS_BACKEND", "gtts")
+        self.TTS_LANG = os.getenv("TTS_LANG", "en")
+        self.TTS_VOICE = os.getenv("TTS_VOICE", "com")
+        self.TTS_CHUNK_SIZE = int(os.getenv("TTS_CHUNK_SIZE", "16384"))
+        self.TTS_MAX_BUFFERED_SEGMENTS = int(os.getenv("TTS_MAX_BUFFERED_SEGMENTS", "8"))
+        self.TTS_CACHE_ENABLED = os.getenv("TTS_CACHE_ENABLED", "true").lower() == "true"
+        self.TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR", "./tts_cache")
+        self.TTS_CACHE_MAX_BYTES = int(os.getenv("TTS_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
         # Webhook secret for validating incoming webhook requests
         self.WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
 
+        # Text verdict cache keyed by content hash
+        self.VERDICT_CACHE_MAX_ENTRIES = int(os.getenv("VERDICT_CACHE_MAX_ENTRIES", "10000"))
+        self.VERDICT_CACHE_TTL_SECONDS = float(os.getenv("VERDICT_CACHE_TTL_SECONDS", "3600"))
+        self.VERDICT_CACHE_DB_LOOKBACK_SECONDS = float(os.getenv("VERDICT_CACHE_DB_LOOKBACK_SECONDS", "604800"))
+
+        # Near-duplicate text matching (SimHash)
+        self.NEAR_DUP_ENABLED = os.getenv("NEAR_DUP_ENABLED", "true").lower() == "true"
+        self.NEAR_DUP_MAX_HAMMING = int(os.getenv("NEAR_DUP_MAX_HAMMING", "3"))
+        self.NEAR_DUP_MIN_TOKENS = int(os.getenv("NEAR_DUP_MIN_TOKENS", "4"))
+        self.NEAR_DUP_MAX_ENTRIES = int(os.getenv("NEAR_DUP_MAX_ENTRIES", "50000"))
+        self.NEAR_DUP_WARM_LIMIT = int(os.getenv("NEAR_DUP_WARM_LIMIT", "10000"))
+
+        # Perceptual-hash image deduplication
+        self.IMAGE_DEDUP_ENABLED = os.getenv("IMAGE_DEDUP_ENABLED", "true").lower() == "true"
+        self.IMAGE_DEDUP_MAX_DISTANCE = int(os.getenv("IMAGE_DEDUP_MAX_DISTANCE", "4"))
+        self.IMAGE_DEDUP_MAX_ENTRIES = int(os.getenv("IMAGE_DEDUP_MAX_ENTRIES", "50000"))
+        self.IMAGE_DEDUP_WARM_LIMIT = int(os.getenv("IMAGE_DEDUP_WARM_LIMIT", "10000"))
+
+        # Batched text classification
+        self.TEXT_BATCH_CHUNK_SIZE = int(os.getenv("TEXT_BATCH_CHUNK_SIZE", "20"))
+        self.TEXT_BATCH_MAX_CONCURRENCY = int(os.getenv("TEXT_BATCH_MAX_CONCURRENCY", "4"))
+
+        # Bulk NDJSON / CSV ingest
+        self.BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", "20"))
+        self.BULK_MAX_CONCURRENCY = int(os.getenv("BULK_MAX_CONCURRENCY", "4"))
+        self.BULK_PERSIST_BATCH = int(os.getenv("BULK_PERSIST_BATCH", "200"))
+        self.BULK_MAX_LINE_BYTES = int(os.getenv("BULK_MAX_LINE_BYTES", "65536"))
+        self.BULK_RUN_STALE_SECONDS = int(os.getenv("BULK_RUN_STALE_SECONDS", "600"))
+
+        # CPU-only pre-filter ahead of the LLM
+        self.PREFILTER_ENABLED = os.getenv("PREFILTER_ENABLED", "true").lower() == "true"
+        self.PREFILTER_MIN_CONFIDENCE = float(os.getenv("PREFILTER_MIN_CONFIDENCE", "0.9"))
+        self.PREFILTER_BLOCKLIST_PATH = os.getenv("PREFILTER_BLOCKLIST_PATH")
+        self.PREFILTER_LOCAL_MODEL = os.getenv("PREFILTER_LOCAL_MODEL")
+
+        # Image upload limits
+        self.MAX_IMAGE_BYTES = int(os.getenv("MAX_IMAGE_BYTES", str(20 * 1024 * 1024)))
+        self.UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(256 * 1024)))
+
+        # Image downscaling / re-encoding before classification and storage
+        self.IMAGE_PREPROCESS_ENABLED = os.getenv("IMAGE_PREPROCESS_ENABLED", "true").lower() == "true"
+        self.IMAGE_MAX_DIMENSION = int(os.getenv("IMAGE_MAX_DIMENSION", "1024"))
+        self.IMAGE_JPEG_QUALITY = int(os.getenv("IMAGE_JPEG_QUALITY", "85"))
+
+        # Database connection pool (non-SQLite databases)
+        self.DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+        self.DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+        self.DB_POOL_RECYCLE_SECONDS = int(os.getenv("DB_POOL_RECYCLE_SECONDS", "1800"))
+        self.DB_POOL_TIMEOUT_SECONDS = float(os.getenv("DB_POOL_TIMEOUT_SECONDS", "30"))
+        self.DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+
+        # History endpoints and analytics summary
+        self.HISTORY_PAGE_SIZE = int(os.getenv("HISTORY_PAGE_SIZE", "50"))
+        self.HISTORY_MAX_PAGE_SIZE = int(os.getenv("HISTORY_MAX_PAGE_SIZE", "500"))
+        self.SUMMARY_MAX_NOTIFICATION_LOGS = int(os.getenv("SUMMARY_MAX_NOTIFICATION_LOGS", "20"))
+
+        # Outbound notification queue
+        self.NOTIFY_DEDUP_WINDOW_SECONDS = int(os.getenv("NOTIFY_DEDUP_WINDOW_SECONDS", "3600"))
+        self.NOTIFY_EMAIL_RATE_PER_SECOND = float(os.getenv("NOTIFY_EMAIL_RATE_PER_SECOND", "5"))
+        self.NOTIFY_EMAIL_BURST = int(os.getenv("NOTIFY_EMAIL_BURST", "10"))
+
+        # Shared HTTP session for outbound fetches
+        self.HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "32"))
+        self.HTTP_CONNECT_TIMEOUT_SECONDS = float(os.getenv("HTTP_CONNECT_TIMEOUT_SECONDS", "3"))
+        self.HTTP_READ_TIMEOUT_SECONDS = float(os.getenv("HTTP_READ_TIMEOUT_SECONDS", "10"))
+
+        # Durable job queue for image moderation
+        self.JOB_SPOOL_DIR = os.getenv("JOB_SPOOL_DIR", "./spool")
+        self.JOB_WORKERS_IN_PROCESS = int(os.getenv("JOB_WORKERS_IN_PROCESS", "2"))
+        self.JOB_WORKER_CONCURRENCY = int(os.getenv("JOB_WORKER_CONCURRENCY", "8"))
+        self.JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "120"))
+        self.JOB_POLL_INTERVAL_SECONDS = float(os.getenv("JOB_POLL_INTERVAL_SECONDS", "1"))
+        self.JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+        self.JOB_RETRY_BASE_DELAY_SECONDS = float(os.getenv("JOB_RETRY_BASE_DELAY_SECONDS", "10"))
+        self.JOB_RETRY_MAX_DELAY_SECONDS = float(os.getenv("JOB_RETRY_MAX_DELAY_SECONDS", "600"))
+
+        # Status subscriptions (SSE / WebSocket) for moderation requests
+        self.MODERATION_EVENTS_POLL_SECONDS = float(os.getenv("MODERATION_EVENTS_POLL_SECONDS", "2"))
+        self.MODERATION_EVENTS_TIMEOUT_SECONDS = float(os.getenv("MODERATION_EVENTS_TIMEOUT_SECONDS", "300"))
+
+        # Micro-batching of concurrent /text requests
+        self.TEXT_BATCHING_ENABLED = os.getenv("TEXT_BATCHING_ENABLED", "false").lower() == "true"
+        self.TEXT_BATCHING_MAX_WAIT_MS = float(os.getenv("TEXT_BATCHING_MAX_WAIT_MS", "20"))
+        self.TEXT_BATCHING_MAX_SIZE = int(os.getenv("TEXT_BATCHING_MAX_SIZE", "16"))
+        self.TEXT_BATCHING_MAX_INFLIGHT = int(os.getenv("TEXT_BATCHING_MAX_INFLIGHT", "4"))
+
+        # Write-behind persistence buffer (notification logs always; /text results when enabled)
+        self.WRITE_BEHIND_ENABLED = os.getenv("WRITE_BEHIND_ENABLED", "false").lower() == "true"
+        self.WRITE_BEHIND_MAX_WAIT_MS = float(os.getenv("WRITE_BEHIND_MAX_WAIT_MS", "10"))
+        self.WRITE_BEHIND_MAX_ROWS = int(os.getenv("WRITE_BEHIND_MAX_ROWS", "200"))
+
 # Create a singleton config object
 config = Config()
@@ -1,18 +1,56 @@
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import os
 
+from src.config import config
+
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./moderator.db")
 
+# Async drivers for the API routes; the sync engine stays for workers and CLI tools
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgres": "postgresql+asyncpg",
+}
+
+def async_database_url(url: str) -> str:
+    """
+    Map a sync DATABASE_URL onto its async driver, unless ASYNC_DATABASE_URL is set.
+    """
+    explicit = os.getenv("ASYNC_DATABASE_URL")
+    if explicit:
+        return explicit
+    scheme, sep, rest = url.partition("://")
+    dialect = scheme.split("+")[0]
+    if dialect not in ASYNC_DRIVERS:
+        raise ValueError(
+            f"No async driver is bundled for '{dialect}' databases; "
+            "install one and set ASYNC_DATABASE_URL (e.g. mysql+aiomysql://...)"
+        )
+    return f"{ASYNC_DRIVERS[dialect]}{sep}{rest}"
+
+POOL_OPTIONS = {
+    "pool_size": config.DB_POOL_SIZE,
+    "max_overflow": config.DB_MAX_OVERFLOW,
+    "pool_recycle": config.DB_POOL_RECYCLE_SECONDS,
+    "pool_timeout": config.DB_POOL_TIMEOUT_SECONDS,
+    "pool_pre_ping": config.DB_POOL_PRE_PING,
+}
+
 if DATABASE_URL.startswith("sqlite"):
     engine = create_engine(
         DATABASE_URL, connect_args={"check_same_thread": False}
     )
+    async_engine = create_async_engine(async_database_url(DATABASE_URL))
 else:
-    engine = create_engine(DATABASE_URL)
+    engine = create_engine(DATABASE_URL, **POOL_OPTIONS)
+    async_engine = create_async_engine(async_database_url(DATABASE_URL), **POOL_OPTIONS)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# expire_on_commit=False: attributes stay readable after commit without an implicit (sync) reload
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
 Base = declarative_base()
 
 def get_db():
@@ -21,3 +59,7 @@ def get_db():
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -1,25 +1,397 @@
-from brevo_python import TransactionalEmailsApi, SendSmtpEmail, ApiClient, Configuration
+import asyncio
+import time
+from dataclasses import dataclass
+from email.message import EmailMessage as MimeMessage
+from email.utils import make_msgid
+from typing import List, Optional
+
+import aiosmtplib
+import httpx
+
 from src.config import config
+from src.logger import logger
+from src.metrics import Histogram, stage_errors, stage_latency
+
+BREVO_SEND_URL = "https://api.brevo.com/v3/smtp/email"
+SENDER_NAME = "Moderation AI"
+
+_STOP = object()
+
+
+@dataclass
+class EmailMessage:
+    to_email: str
+    subject: str
+    html_content: str
+
+
+@dataclass
+class DeliveryResult:
+    ok: bool
+    transport: str
+    latency_ms: float
+    message_id: Optional[str] = None
+    error: Optional[str] = None
+
+
+class EmailTransport:
+    """
+    Delivers a list of messages and reports one DeliveryResult per message, in order.
+
+    Transports never raise for delivery failures; they return failed results
+    so every attempt can be logged with its latency and error.
+    """
+
+    name = "base"
+
+    async def send_many(self, messages: List[EmailMessage]) -> List[DeliveryResult]:
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        pass
+
+    def _failed(self, messages: List[EmailMessage], started: float, error: Exception) -> List[DeliveryResult]:
+        latency_ms = (time.perf_counter() - started) * 1000
+        reason = f"{type(error).__name__}: {error}"
+        return [DeliveryResult(False, self.name, latency_ms, error=reason) for _ in messages]
+
+
+class BrevoTransport(EmailTransport):
+    """
+    Brevo transactional API over a pooled async HTTP client.
+
+    Messages handed over together are sent as one request using Brevo's
+    messageVersions, each version carrying its own recipient, subject and body.
+    """
+
+    name = "brevo"
+
+    def __init__(self, api_key: Optional[str], sender: str, max_connections: int, timeout: float, max_versions: int):
+        self.api_key = api_key
+        self.sender = {"email": sender, "name": SENDER_NAME}
+        self.max_connections = max_connections
+        self.timeout = timeout
+        # Brevo accepts at most 1000 versions per request
+        self.max_versions = max(1, min(max_versions, 1000))
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                headers={"api-key": self.api_key or "", "accept": "application/json"},
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                ),
+            )
+        return self._client
+
+    def _payload(self, messages: List[EmailMessage]) -> dict:
+        first = messages[0]
+        payload = {"sender": self.sender, "subject": first.subject, "htmlContent": first.html_content}
+        if len(messages) == 1:
+            payload["to"] = [{"email": first.to_email}]
+        else:
+            payload["messageVersions"] = [
+                {"to": [{"email": m.to_email}], "subject": m.subject, "htmlContent": m.html_content}
+                for m in messages
+            ]
+        return payload
+
+    @staticmethod
+    def _is_message_rejection(error: Exception) -> bool:
+        # A 4xx may come from a single bad recipient; auth and rate-limit errors apply to every message
+        if not isinstance(error, httpx.HTTPStatusError):
+            return False
+        status = error.response.status_code
+        return 400 <= status < 500 and status not in (401, 403, 429)
+
+    async def _send_chunk(self, messages: List[EmailMessage]) -> List[DeliveryResult]:
+        started = time.perf_counter()
+        try:
+            response = await self._get_client().post(BREVO_SEND_URL, json=self._payload(messages))
+            response.raise_for_status()
+            body = response.json()
+        except Exception as e:
+            if len(messages) > 1 and self._is_message_rejection(e):
+                # Brevo rejects the whole request; resend one by one so only the bad messages fail
+                logger.warning(f"Brevo rejected a batch of {len(messages)} emails ({e}), retrying them one at a time")
+                results = await asyncio.gather(*(self._send_chunk([message]) for message in messages))
+                return [chunk_results[0] for chunk_results in results]
+            return self._failed(messages, started, e)
+
+        latency_ms = (time.perf_counter() - started) * 1000
+        message_ids = body.get("messageIds") or [body.get("messageId")]
+        return [
+            DeliveryResult(True, self.name, latency_ms, message_id=message_ids[i] if i < len(message_ids) else None)
+            for i in range(len(messages))
+        ]
+
+    async def send_many(self, messages: List[EmailMessage]) -> List[DeliveryResult]:
+        chunks = [messages[i:i + self.max_versions] for i in range(0, len(messages), self.max_versions)]
+        results = await asyncio.gather(*(self._send_chunk(chunk) for chunk in chunks))
+        return [result for chunk_results in results for result in chunk_results]
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+class SmtpTransport(EmailTransport):
+    """
+    Plain SMTP via aiosmtplib, e.g. a local MailHog / smtp4dev stand-in for Brevo.
+
+    Each batch is sent over a single connection.
+    """
+
+    name = "smtp"
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        sender: str,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        use_tls: bool = False,
+        timeout: float = 10,
+    ):
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.timeout = timeout
+
+    def _mime(self, message: EmailMessage) -> MimeMessage:
+        mime = MimeMessage()
+        mime["From"] = f"{SENDER_NAME} <{self.sender}>"
+        mime["To"] = message.to_email
+        mime["Subject"] = message.subject
+        mime["Message-ID"] = make_msgid()
+        mime.set_content(message.html_content, subtype="html")
+        return mime
+
+    async def send_many(self, messages: List[EmailMessage]) -> List[DeliveryResult]:
+        started = time.perf_counter()
+        smtp = aiosmtplib.SMTP(hostname=self.host, port=self.port, use_tls=self.use_tls, timeout=self.timeout)
+        try:
+            await smtp.connect()
+            if self.username:
+                await smtp.login(self.username, self.password or "")
+        except Exception as e:
+            return self._failed(messages, started, e)
+
+        results = []
+        try:
+            for message in messages:
+                sent_at = time.perf_counter()
+                mime = self._mime(message)
+                try:
+                    await smtp.send_message(mime)
+                    results.append(DeliveryResult(
+                        True, self.name, (time.perf_counter() - sent_at) * 1000, message_id=mime["Message-ID"]
+                    ))
+                except Exception as e:
+                    results.extend(self._failed([message], sent_at, e))
+        finally:
+            try:
+                await smtp.quit()
+            except Exception:
+                pass
+        return results
+
+
+class NullTransport(EmailTransport):
+    """
+    Accepts and discards every message; useful for benchmarks.
+    """
+
+    name = "null"
+
+    async def send_many(self, messages: List[EmailMessage]) -> List[DeliveryResult]:
+        return [DeliveryResult(True, self.name, 0.0) for _ in messages]
+
+
+class RecordingTransport(NullTransport):
+    """
+    Keeps every delivered message in memory for tests.
+    """
+
+    name = "recording"
+
+    def __init__(self):
+        self.sent: List[EmailMessage] = []
+
+    async def send_many(self, messages: List[EmailMessage]) -> List[DeliveryResult]:
+        self.sent.extend(messages)
+        return await super().send_many(messages)
+
+
+def build_transport(kind: str) -> EmailTransport:
+    if kind == "brevo":
+        return BrevoTransport(
+            api_key=config.BREVO_API_KEY,
+            sender=config.EMAIL_SENDER,
+            max_connections=config.EMAIL_MAX_CONNECTIONS,
+            timeout=config.EMAIL_TIMEOUT_SECONDS,
+            max_versions=config.EMAIL_BATCH_MAX_SIZE,
+        )
+    if kind == "smtp":
+        return SmtpTransport(
+            host=config.SMTP_HOST,
+            port=config.SMTP_PORT,
+            sender=config.EMAIL_SENDER,
+            username=config.SMTP_USERNAME,
+            password=config.SMTP_PASSWORD,
+            use_tls=config.SMTP_USE_TLS,
+            timeout=config.EMAIL_TIMEOUT_SECONDS,
+        )
+    if kind == "recording":
+        return RecordingTransport()
+    if kind == "null":
+        return NullTransport()
+    raise ValueError(f"Unknown EMAIL_TRANSPORT '{kind}', expected brevo, smtp, recording or null")
+
+
+class EmailDispatcher:
+    """
+    Coalesces concurrent sends into batches for the configured transport.
+
+    Callers await send(); a background loop collects queued messages for up
+    to max_wait_ms or max_batch_size messages and hands them to the
+    transport in one call. At most max_inflight batches are in flight.
+    """
+
+    def __init__(self, transport: EmailTransport, max_wait_ms: float, max_batch_size: int, max_inflight: int):
+        self.transport = transport
+        self.max_wait = max_wait_ms / 1000
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_inflight = max(1, max_inflight)
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._inflight: Optional[asyncio.Semaphore] = None
+        self._loop_task: Optional[asyncio.Task] = None
+        self._batch_tasks: set = set()
+
+        self.latency_histogram = Histogram([0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10])
+        self.batch_size_histogram = Histogram([1, 5, 10, 25, 50, 100, 250, 500, 1000])
+        self.batches = 0
+        self.sent = 0
+        self.failed = 0
+
+    def start(self) -> None:
+        if self._loop_task is not None and not self._loop_task.done():
+            return
+        self._queue = asyncio.Queue()
+        self._inflight = asyncio.Semaphore(self.max_inflight)
+        self._loop_task = asyncio.create_task(self._run())
+        logger.info(
+            f"Email dispatcher started (transport={self.transport.name}, "
+            f"max_wait={self.max_wait * 1000:.0f}ms, max_batch_size={self.max_batch_size})"
+        )
+
+    async def stop(self) -> None:
+        """
+        Stop the collection loop, deliver everything still queued and close the transport.
+        """
+        if self._loop_task is not None:
+            # A sentinel rather than cancel(), so a batch being collected or waiting for a slot is not lost
+            self._queue.put_nowait(_STOP)
+            await self._loop_task
+            self._loop_task = None
+
+            # Deliver anything queued behind the sentinel so no caller is left waiting
+            leftover = []
+            while not self._queue.empty():
+                item = self._queue.get_nowait()
+                if item is not _STOP:
+                    leftover.append(item)
+            for offset in range(0, len(leftover), self.max_batch_size):
+                await self._dispatch(leftover[offset:offset + self.max_batch_size])
+            if self._batch_tasks:
+                await asyncio.gather(*self._batch_tasks, return_exceptions=True)
+        await self.transport.close()
+
+    async def send(self, to_email: str, subject: str, html_content: str) -> DeliveryResult:
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((EmailMessage(to_email, subject, html_content), future))
+        return await future
+
+    async def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is _STOP:
+                return
+            batch = [item]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            await self._dispatch(batch)
+
+    async def _dispatch(self, batch) -> None:
+        self.batch_size_histogram.observe(len(batch))
+        self.batches += 1
+        await self._inflight.acquire()
+        task = asyncio.create_task(self._send_batch(batch))
+        self._batch_tasks.add(task)
+        task.add_done_callback(self._batch_tasks.discard)
+
+    async def _send_batch(self, batch) -> None:
+        try:
+            try:
+                results = await self.transport.send_many([message for message, _ in batch])
+            except Exception as e:
+                results = self.transport._failed([message for message, _ in batch], time.perf_counter(), e)
+            for (message, future), result in zip(batch, results):
+                self.latency_histogram.observe(result.latency_ms / 1000)
+                stage_latency.labels("email_send").observe(result.latency_ms / 1000)
+                if result.ok:
+                    self.sent += 1
+                else:
+                    self.failed += 1
+                    stage_errors.inc("email_send")
+                    logger.error(f"Email to {message.to_email} via {result.transport} failed: {result.error}")
+                if not future.done():
+                    future.set_result(result)
+        finally:
+            # Never leave a caller waiting, even if the transport returned short or the task was cancelled
+            for message, future in batch:
+                if not future.done():
+                    self.failed += 1
+                    future.set_result(DeliveryResult(False, self.transport.name, 0.0, error="Delivery was interrupted"))
+            self._inflight.release()
+
+    def stats(self) -> dict:
+        return {
+            "transport": self.transport.name,
+            "batches": self.batches,
+            "sent": self.sent,
+            "failed": self.failed,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "latency_seconds": self.latency_histogram.snapshot(),
+            "messages_per_batch": self.batch_size_histogram.snapshot(),
+        }
+
 
-BREVO_API_KEY = config.BREVO_API_KEY
-EMAIL_SENDER = config.EMAIL_SENDER
-
-configuration = Configuration()
-configuration.api_key['api-key'] = BREVO_API_KEY
-
-api_client = ApiClient(configuration)
-api_instance = TransactionalEmailsApi(api_client)
-
-def send_alert_email(subject, html_content, to_email):
-    email = SendSmtpEmail(
-        to=[{"email": to_email}],
-        subject=subject,
-        html_content=html_content,
-        sender={"email": EMAIL_SENDER, "name": "Moderation AI"}
-    )
-    try:
-        response = api_instance.send_transac_email(email)
-        return response
-    except Exception as e:
-        print(f"❌ Failed to send email: {e}")
-        return e
+email_dispatcher = EmailDispatcher(
+    transport=build_transport(config.EMAIL_TRANSPORT),
+    max_wait_ms=config.EMAIL_BATCH_MAX_WAIT_MS,
+    max_batch_size=config.EMAIL_BATCH_MAX_SIZE,
+    max_inflight=config.EMAIL_MAX_CONNECTIONS,
+)
@@ -0,0 +1,88 @@
+import asyncio
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, Set
+
+
+class Subscription:
+    """
+    Wake-up signal for one watcher of one moderation request.
+
+    notify() may be called from any thread; wait() runs on the loop that subscribed.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self._loop = loop
+        self._event = asyncio.Event()
+
+    def notify(self) -> None:
+        try:
+            self._loop.call_soon_threadsafe(self._event.set)
+        except RuntimeError:
+            # The subscriber's loop is already closed
+            pass
+
+    async def wait(self, timeout: float) -> bool:
+        """
+        Wait until notified or the timeout passes; returns whether a notification arrived.
+        """
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self._event.clear()
+
+
+class RequestEventBroker:
+    """
+    In-process pub/sub of "this moderation request changed" notifications.
+
+    Publishers only signal; subscribers re-read the request from the
+    database, so a missed or duplicated signal never shows stale data.
+    Changes committed by workers in other processes are not published
+    here and are picked up by the subscribers' polling fallback.
+    """
+
+    def __init__(self):
+        self._subscribers: Dict[int, Set[Subscription]] = {}
+        self._lock = threading.Lock()
+
+        self.published = 0
+        self.delivered = 0
+
+    @contextmanager
+    def subscribe(self, request_id: int) -> Iterator[Subscription]:
+        subscription = Subscription(asyncio.get_running_loop())
+        with self._lock:
+            self._subscribers.setdefault(request_id, set()).add(subscription)
+        try:
+            yield subscription
+        finally:
+            with self._lock:
+                subscribers = self._subscribers.get(request_id)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._subscribers[request_id]
+
+    def publish(self, request_id: int) -> None:
+        with self._lock:
+            subscribers = list(self._subscribers.get(request_id, ()))
+            self.published += 1
+            self.delivered += len(subscribers)
+        for subscription in subscribers:
+            subscription.notify()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "watched_requests": len(self._subscribers),
+                "subscribers": sum(len(subscribers) for subscribers in self._subscribers.values()),
+                "published": self.published,
+                "delivered": self.delivered,
+            }
+
+
+request_events = RequestEventBroker()
@@ -0,0 +1,155 @@
+import io
+import threading
+from collections import OrderedDict
+from typing import Optional, Union
+
+from PIL import Image
+from sqlalchemy.orm import Session
+
+from src import models, schemas
+from src.cache import verdict_from_result
+from src.config import config
+
+HASH_SIZE = 8
+
+
+def dhash(image: Union[bytes, str]) -> int:
+    """
+    Compute a 64-bit difference hash of an image given as bytes or a file path.
+
+    The image is reduced to a 9x8 grayscale thumbnail and each bit records
+    whether a pixel is brighter than its right-hand neighbour, which is
+    stable under re-encoding, resizing and small colour changes.
+    """
+    source = io.BytesIO(image) if isinstance(image, bytes) else image
+    with Image.open(source) as img:
+        img.draft("L", (HASH_SIZE * 4, HASH_SIZE * 4))
+        small = img.convert("L").resize((HASH_SIZE + 1, HASH_SIZE), Image.Resampling.LANCZOS)
+    pixels = list(small.getdata())
+
+    value = 0
+    for row in range(HASH_SIZE):
+        offset = row * (HASH_SIZE + 1)
+        for col in range(HASH_SIZE):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def phash_to_hex(value: int) -> str:
+    return f"{value:016x}"
+
+
+class _BKNode:
+    __slots__ = ("value", "children")
+
+    def __init__(self, value: int):
+        self.value = value
+        self.children: dict[int, "_BKNode"] = {}
+
+
+class ImageHashIndex:
+    """
+    BK-tree over perceptual hashes mapping each hash to its cached verdict
+    and the storage URL of the image it was computed from.
+    """
+
+    def __init__(self, max_distance: int, max_entries: int):
+        self.max_distance = max_distance
+        self.max_entries = max_entries
+        self._root: Optional[_BKNode] = None
+        self._entries: "OrderedDict[int, tuple[schemas.ModerationResult, Optional[str]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    def _insert(self, value: int) -> None:
+        if self._root is None:
+            self._root = _BKNode(value)
+            return
+        node = self._root
+        while True:
+            distance = (node.value ^ value).bit_count()
+            if distance == 0:
+                return
+            child = node.children.get(distance)
+            if child is None:
+                node.children[distance] = _BKNode(value)
+                return
+            node = child
+
+    def _rebuild(self) -> None:
+        self._root = None
+        for value in self._entries:
+            self._insert(value)
+
+    def find(self, value: int) -> Optional[tuple[schemas.ModerationResult, Optional[str]]]:
+        """
+        Return (verdict, content_url) of the closest hash within max_distance.
+        """
+        with self._lock:
+            best, best_distance = None, self.max_distance + 1
+            stack = [self._root] if self._root is not None else []
+            while stack:
+                node = stack.pop()
+                distance = (node.value ^ value).bit_count()
+                if distance < best_distance:
+                    best, best_distance = node.value, distance
+                # Triangle inequality: only subtrees within the search radius can match
+                for edge, child in node.children.items():
+                    if distance - self.max_distance <= edge <= distance + self.max_distance:
+                        stack.append(child)
+            if best is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(best)
+            self.hits += 1
+            return self._entries[best]
+
+    def add(self, value: int, result: schemas.ModerationResult, content_url: Optional[str]) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            if value not in self._entries:
+                self._insert(value)
+            self._entries[value] = (result, content_url)
+            self._entries.move_to_end(value)
+            if len(self._entries) > self.max_entries:
+                # BK-trees do not support deletion, so drop the oldest quarter and rebuild
+                for _ in range(max(1, self.max_entries // 4)):
+                    self._entries.popitem(last=False)
+                self._rebuild()
+
+    def warm(self, db: Session, limit: int) -> int:
+        """
+        Load the most recent image hashes and verdicts from the database.
+        """
+        rows = (
+            db.query(models.ModerationRequest.perceptual_hash, models.ModerationRequest.content_url, models.ModerationResult)
+              .join(models.ModerationResult, models.ModerationResult.request_id == models.ModerationRequest.id)
+              .filter(
+                  models.ModerationRequest.content_type == "image",
+                  models.ModerationRequest.perceptual_hash.isnot(None),
+              )
+              .order_by(models.ModerationRequest.created_at.desc())
+              .limit(limit)
+              .all()
+        )
+        for hash_hex, content_url, row in reversed(rows):
+            self.add(int(hash_hex, 16), verdict_from_result(row, "image"), content_url)
+        return len(rows)
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "max_distance": self.max_distance,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+image_hash_index = ImageHashIndex(
+    max_distance=config.IMAGE_DEDUP_MAX_DISTANCE,
+    max_entries=config.IMAGE_DEDUP_MAX_ENTRIES,
+)
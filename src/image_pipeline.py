@@ -0,0 +1,146 @@
+import asyncio
+
+from src import models
+from src.config import config
+from src.database import SessionLocal
+from src.email_template import moderation_email_template
+from src.events import request_events
+from src.image_hash import image_hash_index, dhash, phash_to_hex
+from src.image_preprocess import preprocess_image
+from src.jobs import remove_spool_file
+from src.llm_classifier import classify_image_gemini_async
+from src.logger import logger
+from src.metrics import timed
+from src.notifications import RESULT_EMAIL, deliver_email
+from src.utils import upload_image_to_cloudinary, read_file_bytes
+
+
+async def gather_or_cancel(*aws) -> list:
+    """
+    Like asyncio.gather(), but cancel the other tasks as soon as one fails.
+    """
+    tasks = [asyncio.ensure_future(aw) for aw in aws]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+    finally:
+        # Also reached when the caller itself is cancelled
+        pending = [task for task in tasks if not task.done()]
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.wait(pending)
+    for task in tasks:
+        if not task.cancelled() and task.exception() is not None:
+            raise task.exception()
+    return [task.result() for task in tasks]
+
+
+async def process_image_moderation(request_id: int, payload_path: str) -> None:
+    """
+    Upload, classify and store the verdict for one image moderation request.
+
+    Raises on failure so the job queue can retry or dead-letter the job.
+    Safe to re-run: a request that is already completed is left untouched.
+    """
+    def load_request():
+        db = SessionLocal()
+        try:
+            return db.get(models.ModerationRequest, request_id)
+        finally:
+            db.close()
+
+    req = await asyncio.to_thread(load_request)
+    if req is None:
+        raise LookupError(f"Moderation request with id {request_id} not found")
+    if req.status == "completed":
+        logger.info(f"Request ID {request_id} already completed, skipping")
+        return
+
+    # Downscale and strip metadata once; the result feeds hashing, storage and the LLM
+    image_path = payload_path
+    prepared = None
+    if config.IMAGE_PREPROCESS_ENABLED:
+        try:
+            prepared = await asyncio.to_thread(preprocess_image, payload_path)
+            image_path = prepared.path
+            logger.info(
+                f"Preprocessed image for request ID {request_id}: "
+                f"{prepared.original_bytes} -> {prepared.processed_bytes} bytes ({prepared.width}x{prepared.height})"
+            )
+        except Exception as e:
+            logger.warning(f"Could not preprocess image for request ID {request_id}, using original: {e}")
+
+    try:
+        perceptual_hash = None
+        cached = None
+        if config.IMAGE_DEDUP_ENABLED:
+            try:
+                perceptual_hash = await asyncio.to_thread(dhash, image_path)
+                cached = image_hash_index.find(perceptual_hash)
+            except Exception as e:
+                logger.warning(f"Could not compute perceptual hash for request ID {request_id}: {e}")
+
+        if cached is not None:
+            result_data, cloudinary_url = cached
+            logger.info(f"Perceptual-hash match for request ID {request_id}, skipping upload and classification")
+        else:
+            # Read the (downscaled) image once and classify it from memory while it uploads
+            image_bytes = await asyncio.to_thread(read_file_bytes, image_path)
+            cloudinary_url, result_data = await gather_or_cancel(
+                upload_image_to_cloudinary(image_bytes),
+                classify_image_gemini_async(image_bytes),
+            )
+            logger.info(f"Uploaded and classified image for request ID {request_id}")
+            if perceptual_hash is not None:
+                image_hash_index.add(perceptual_hash, result_data, cloudinary_url)
+    finally:
+        if prepared is not None:
+            remove_spool_file(prepared.path)
+
+    def save_result():
+        db = SessionLocal()
+        try:
+            req = db.get(models.ModerationRequest, request_id)
+            req.content_url = cloudinary_url
+            if perceptual_hash is not None:
+                req.perceptual_hash = phash_to_hex(perceptual_hash)
+            req.status = "completed"
+
+            result = models.ModerationResult(
+                request_id=request_id,
+                classification=result_data.classification,
+                confidence=result_data.confidence,
+                reasoning=result_data.reason,
+                llm_response=result_data.description,
+            )
+            db.add(result)
+            with timed("db_commit"):
+                db.commit()
+            logger.info(f"Moderation result saved and request {request_id} marked as completed")
+            return req.email
+        finally:
+            db.close()
+
+    email = await asyncio.to_thread(save_result)
+    # Wake status subscribers in this process; others pick it up by polling
+    request_events.publish(request_id)
+
+    # Send email notification after successful commit; the outcome lands in notification_logs
+    try:
+        email_html = moderation_email_template(
+            request_id=request_id,
+            classification=result_data.classification,
+            confidence=result_data.confidence,
+            reasoning=result_data.reason,
+        )
+        delivery = await deliver_email(
+            request_id,
+            RESULT_EMAIL,
+            to_email=email,
+            subject="Your content moderation result is ready",
+            html_content=email_html,
+        )
+        if delivery.ok:
+            logger.info(f"Moderation result email sent for request ID {request_id} to {email}")
+    except Exception as e:
+        logger.error(f"Failed to send moderation email for request ID {request_id}: {e}")
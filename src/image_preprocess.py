@@ -0,0 +1,117 @@
+import argparse
+import asyncio
+import os
+import statistics
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from PIL import Image, ImageOps
+
+from src.config import config
+
+
+@dataclass
+class PreprocessedImage:
+    path: str
+    width: int
+    height: int
+    original_bytes: int
+    processed_bytes: int
+
+
+def preprocess_image(
+    source_path: str,
+    dest_path: Optional[str] = None,
+    max_dimension: Optional[int] = None,
+    quality: Optional[int] = None,
+) -> PreprocessedImage:
+    """
+    Downscale and re-encode an image to a bounded-size JPEG without metadata.
+
+    JPEGs are decoded at reduced scale via draft(), which skips most of the
+    IDCT work for large phone photos. EXIF orientation is applied to the
+    pixels before the metadata is dropped, so the output looks the same but
+    carries no EXIF, GPS or ICC payload.
+    """
+    max_dimension = max_dimension or config.IMAGE_MAX_DIMENSION
+    quality = quality or config.IMAGE_JPEG_QUALITY
+    dest_path = dest_path or f"{os.path.splitext(source_path)[0]}.prep.jpg"
+
+    with Image.open(source_path) as img:
+        img.draft("RGB", (max_dimension, max_dimension))
+        img = ImageOps.exif_transpose(img)
+        if img.mode in ("RGBA", "LA", "P"):
+            rgba = img.convert("RGBA")
+            background = Image.new("RGB", rgba.size, (255, 255, 255))
+            background.paste(rgba, mask=rgba.getchannel("A"))
+            img = background
+        elif img.mode != "RGB":
+            img = img.convert("RGB")
+        img.thumbnail((max_dimension, max_dimension), Image.Resampling.LANCZOS)
+        img.save(dest_path, "JPEG", quality=quality, optimize=True)
+        width, height = img.size
+
+    return PreprocessedImage(
+        path=dest_path,
+        width=width,
+        height=height,
+        original_bytes=os.path.getsize(source_path),
+        processed_bytes=os.path.getsize(dest_path),
+    )
+
+
+async def benchmark(directory: str, classify: bool) -> None:
+    """
+    Report preprocessing latency, bytes saved and (optionally) verdict agreement
+    between original and preprocessed images for every image in a directory.
+    """
+    from src.llm_classifier import classify_image_gemini_async
+
+    latencies, original_sizes, processed_sizes = [], [], []
+    agreements, classify_original, classify_processed = [], [], []
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        if not os.path.isfile(path) or name.endswith(".prep.jpg"):
+            continue
+        dest = os.path.join(directory, f"{name}.prep.jpg")
+        try:
+            started = time.perf_counter()
+            result = preprocess_image(path, dest)
+            latencies.append(time.perf_counter() - started)
+        except Exception as e:
+            print(f"skip {name}: {e}")
+            continue
+        original_sizes.append(result.original_bytes)
+        processed_sizes.append(result.processed_bytes)
+
+        if classify:
+            started = time.perf_counter()
+            original = await classify_image_gemini_async(path)
+            classify_original.append(time.perf_counter() - started)
+            started = time.perf_counter()
+            processed = await classify_image_gemini_async(dest)
+            classify_processed.append(time.perf_counter() - started)
+            agreements.append(original.classification == processed.classification)
+            print(f"{name}: {original.classification} -> {processed.classification}")
+        os.remove(dest)
+
+    if not latencies:
+        print("No images found")
+        return
+    print(f"images:              {len(latencies)}")
+    print(f"preprocess p50/max:  {statistics.median(latencies) * 1000:.1f} / {max(latencies) * 1000:.1f} ms")
+    print(f"bytes in/out:        {sum(original_sizes)} / {sum(processed_sizes)} "
+          f"({sum(processed_sizes) / sum(original_sizes):.1%})")
+    if classify:
+        print(f"classify p50 orig:   {statistics.median(classify_original) * 1000:.0f} ms")
+        print(f"classify p50 prep:   {statistics.median(classify_processed) * 1000:.0f} ms")
+        print(f"verdict agreement:   {sum(agreements) / len(agreements):.1%}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark image preprocessing")
+    parser.add_argument("directory")
+    parser.add_argument("--classify", action="store_true", help="also compare Gemini verdicts (calls the API)")
+    args = parser.parse_args()
+    asyncio.run(benchmark(args.directory, args.classify))
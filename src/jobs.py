@@ -0,0 +1,151 @@
+import os
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import and_, func, or_, update
+from sqlalchemy.orm import Session
+
+from src import models
+from src.config import config
+from src.logger import logger
+from src.models import utcnow  # noqa: F401  re-exported for job handlers
+
+
+def remove_spool_file(path: Optional[str]) -> None:
+    if not path:
+        return
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logger.warning(f"Could not remove spool file {path}: {e}")
+
+
+def enqueue_job(db: Session, request_id: int, payload_path: str, kind: str = "image") -> models.ModerationJob:
+    """
+    Add a pending job to the session; it becomes visible to workers once the caller commits.
+    """
+    job = models.ModerationJob(
+        request_id=request_id,
+        kind=kind,
+        payload_path=payload_path,
+        status="pending",
+        max_attempts=config.JOB_MAX_ATTEMPTS,
+    )
+    db.add(job)
+    return job
+
+
+def _claimable(now: datetime):
+    return or_(
+        and_(models.ModerationJob.status == "pending", models.ModerationJob.available_at <= now),
+        and_(models.ModerationJob.status == "leased", models.ModerationJob.lease_expires_at < now),
+    )
+
+
+def lease_job(db: Session, worker_id: str) -> Optional[models.ModerationJob]:
+    """
+    Atomically claim the oldest runnable job, including jobs whose lease expired.
+
+    The claim is a conditional UPDATE, so concurrent workers (in this or any
+    other process) never lease the same job twice.
+    """
+    now = utcnow()
+    candidates = (
+        db.query(models.ModerationJob.id)
+          .filter(_claimable(now))
+          .order_by(models.ModerationJob.id)
+          .limit(5)
+          .all()
+    )
+    for (job_id,) in candidates:
+        claimed = db.execute(
+            update(models.ModerationJob)
+            .where(models.ModerationJob.id == job_id, _claimable(now))
+            .values(
+                status="leased",
+                leased_by=worker_id,
+                lease_expires_at=now + timedelta(seconds=config.JOB_LEASE_SECONDS),
+                attempts=models.ModerationJob.attempts + 1,
+                updated_at=now,
+            )
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.commit()
+        if claimed:
+            return db.get(models.ModerationJob, job_id)
+    return None
+
+
+def renew_lease(db: Session, job_id: int, worker_id: str) -> bool:
+    now = utcnow()
+    renewed = db.execute(
+        update(models.ModerationJob)
+        .where(
+            models.ModerationJob.id == job_id,
+            models.ModerationJob.status == "leased",
+            models.ModerationJob.leased_by == worker_id,
+        )
+        .values(lease_expires_at=now + timedelta(seconds=config.JOB_LEASE_SECONDS), updated_at=now)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.commit()
+    return bool(renewed)
+
+
+def _finish_leased(db: Session, job: models.ModerationJob, worker_id: str, **values) -> bool:
+    # Conditional on the lease, so a worker whose lease expired cannot overwrite
+    # the outcome of the worker that has since re-leased the job
+    finished = db.execute(
+        update(models.ModerationJob)
+        .where(
+            models.ModerationJob.id == job.id,
+            models.ModerationJob.status == "leased",
+            models.ModerationJob.leased_by == worker_id,
+        )
+        .values(lease_expires_at=None, updated_at=utcnow(), **values)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.commit()
+    return bool(finished)
+
+
+def complete_job(db: Session, job: models.ModerationJob, worker_id: str) -> bool:
+    """
+    Mark a job done. Returns False, changing nothing, if the worker no longer holds its lease.
+    """
+    if not _finish_leased(db, job, worker_id, status="done", last_error=None):
+        return False
+    remove_spool_file(job.payload_path)
+    return True
+
+
+def fail_job(db: Session, job: models.ModerationJob, worker_id: str, error: str) -> Optional[str]:
+    """
+    Schedule a retry with exponential backoff, or dead-letter the job once
+    it has used up its attempts. Dead-lettered payloads are kept for inspection.
+
+    Returns the job's new status, or None if the worker no longer holds its lease.
+    """
+    if job.attempts >= job.max_attempts:
+        status, values = "dead", {}
+    else:
+        delay = min(config.JOB_RETRY_MAX_DELAY_SECONDS, config.JOB_RETRY_BASE_DELAY_SECONDS * (2 ** (job.attempts - 1)))
+        status, values = "pending", {"available_at": utcnow() + timedelta(seconds=delay)}
+    if not _finish_leased(db, job, worker_id, status=status, last_error=error[:2000], **values):
+        return None
+    if status == "dead":
+        logger.error(f"Job {job.id} for request ID {job.request_id} dead-lettered after {job.attempts} attempts: {error}")
+    else:
+        logger.warning(f"Job {job.id} for request ID {job.request_id} failed (attempt {job.attempts}), retrying in {delay:.0f}s: {error}")
+    return status
+
+
+def queue_stats(db: Session) -> dict:
+    rows = (
+        db.query(models.ModerationJob.status, func.count(models.ModerationJob.id))
+          .group_by(models.ModerationJob.status)
+          .all()
+    )
+    return {status: count for status, count in rows}
@@ -1,16 +1,222 @@
+import asyncio
+import json
+import random
+import threading
+import time
+from contextlib import asynccontextmanager
 import google.generativeai as genai
+from google.api_core import exceptions as google_exceptions
 from PIL import Image
 import requests
 from io import BytesIO
+from typing import BinaryIO, Callable, List, Optional, TypeVar, Union
+from pydantic import ValidationError
 from src.config import config
 from src.schemas import ModerationResult
-from src.utils import clean_json
+from src.utils import clean_json, fetch_url_bytes
+from src.logger import logger
+from src.metrics import llm_tokens, timed
 
 genai.configure(api_key=config.GEMINI_API_KEY)
 gemini_model = genai.GenerativeModel(config.GEMINI_MODEL)
 
-def classify_text_gemini(text: str) -> ModerationResult:
-    prompt = f"""
+IMAGE_PROMPT = """
+    You are a strict content moderator.
+    Look at this image and:
+    1. Classify it into one of: toxic, spam, harassment, safe.
+    2. Give a confidence score (0-1).
+    3. Explain your reasoning.
+    4. Describe what is shown in the image.
+    Respond strictly in JSON with keys: content_type, classification, confidence, reason, description.
+    """
+
+
+class LLMOverloadedError(Exception):
+    """
+    Raised when the classifier's concurrency limit and wait queue are both full.
+    """
+
+    def __init__(self, retry_after: float):
+        super().__init__("LLM classifier is at capacity")
+        self.retry_after = retry_after
+
+
+class InvalidLLMResponseError(ValueError):
+    """
+    Raised when Gemini answers with JSON that does not have the expected shape.
+    """
+
+
+class LLMUnavailableError(Exception):
+    """
+    Raised without calling Gemini while the circuit breaker is open.
+    """
+
+    def __init__(self, retry_after: float):
+        super().__init__("LLM classifier is degraded, circuit breaker is open")
+        self.retry_after = retry_after
+
+
+# Provider and transport failures: retried, and counted by the circuit breaker
+PROVIDER_ERRORS = (
+    asyncio.TimeoutError,
+    TimeoutError,
+    ConnectionError,
+    requests.exceptions.ConnectionError,
+    requests.exceptions.Timeout,
+    google_exceptions.DeadlineExceeded,
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.InternalServerError,
+    google_exceptions.TooManyRequests,
+    google_exceptions.ResourceExhausted,
+)
+
+# Malformed answers: retried, but the provider is up, so the breaker ignores them
+OUTPUT_ERRORS = (
+    json.JSONDecodeError,
+    ValidationError,
+    InvalidLLMResponseError,
+)
+
+TRANSIENT_ERRORS = PROVIDER_ERRORS + OUTPUT_ERRORS
+
+
+class CircuitBreaker:
+    """
+    Opens after failure_threshold consecutive failures and rejects calls for
+    reset_seconds; then lets a single trial call through (half-open) and
+    closes again if it succeeds.
+    """
+
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self.short_circuited = 0
+        self._trial_in_progress = False
+        self._lock = threading.Lock()
+
+    def before_call(self) -> None:
+        with self._lock:
+            if self.state == "closed":
+                return
+            remaining = self.opened_at + self.reset_seconds - time.monotonic()
+            if self.state == "open" and remaining <= 0:
+                self.state = "half_open"
+            if self.state == "half_open" and not self._trial_in_progress:
+                self._trial_in_progress = True
+                return
+            self.short_circuited += 1
+            raise LLMUnavailableError(max(remaining, 1.0))
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.state != "closed":
+                logger.info("LLM circuit breaker closed")
+            self.state = "closed"
+            self.consecutive_failures = 0
+            self._trial_in_progress = False
+
+    def release_trial(self) -> None:
+        """
+        Give up a half-open trial slot after an error that says nothing about provider health.
+        """
+        with self._lock:
+            self._trial_in_progress = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.consecutive_failures += 1
+            self._trial_in_progress = False
+            if self.state == "half_open" or self.consecutive_failures >= self.failure_threshold:
+                if self.state != "open":
+                    self.times_opened += 1
+                    logger.warning(f"LLM circuit breaker opened after {self.consecutive_failures} consecutive failures")
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+    @property
+    def is_open(self) -> bool:
+        return self.state == "open"
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "times_opened": self.times_opened,
+            "short_circuited": self.short_circuited,
+        }
+
+
+llm_breaker = CircuitBreaker(
+    failure_threshold=config.LLM_BREAKER_FAILURE_THRESHOLD,
+    reset_seconds=config.LLM_BREAKER_RESET_SECONDS,
+)
+
+
+def retry_delay(attempt: int) -> float:
+    """
+    Exponential backoff with full jitter for the given retry attempt (1-based).
+    """
+    ceiling = min(config.LLM_RETRY_MAX_DELAY_SECONDS, config.LLM_RETRY_BASE_DELAY_SECONDS * (2 ** (attempt - 1)))
+    return random.uniform(0, ceiling)
+
+
+class ConcurrencyLimiter:
+    """
+    Bounds in-flight LLM calls and fails fast once too many callers are waiting.
+    """
+
+    def __init__(self, max_concurrency: int, max_queue: int, retry_after: float):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.retry_after = retry_after
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.in_flight = 0
+        self.waiting = 0
+        self.rejected = 0
+
+    @asynccontextmanager
+    async def slot(self):
+        if self._semaphore.locked() and self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise LLMOverloadedError(self.retry_after)
+
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+
+    def stats(self) -> dict:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "rejected": self.rejected,
+        }
+
+
+llm_limiter = ConcurrencyLimiter(
+    max_concurrency=config.LLM_MAX_CONCURRENCY,
+    max_queue=config.LLM_MAX_QUEUE,
+    retry_after=config.LLM_RETRY_AFTER_SECONDS,
+)
+
+
+def build_text_prompt(text: str) -> str:
+    return f"""
     You are a strict content moderator.
     Classify the following text into one of: toxic, spam, harassment, safe.
     Give a confidence score (0-1), explain your reasoning, and summarize what it says.
@@ -18,26 +224,137 @@ def classify_text_gemini(text: str) -> ModerationResult:
 
     Text: {text}
     """
-    response = gemini_model.generate_content(prompt)
-    json_text = clean_json(response.text)
-    return ModerationResult.model_validate_json(json_text)
 
-def classify_image_gemini(image_source: str) -> ModerationResult:
-    if image_source.startswith("http"):
-        img_data = requests.get(image_source).content
-        image = Image.open(BytesIO(img_data))
+def build_texts_prompt(texts: List[str]) -> str:
+    items = "\n".join(json.dumps({"index": i, "text": text}) for i, text in enumerate(texts))
+    return f"""
+    You are a strict content moderator.
+    Classify each of the following texts into one of: toxic, spam, harassment, safe.
+    For each text give a confidence score (0-1), explain your reasoning, and summarize what it says.
+    Respond strictly with a JSON array containing one object per text, with keys:
+    index, content_type, classification, confidence, reason, description.
+    Use the index given with each text and "text" as the content_type.
+
+    Texts (one JSON object per line):
+    {items}
+    """
+
+def parse_result(response_text: str) -> ModerationResult:
+    return ModerationResult.model_validate_json(clean_json(response_text))
+
+def parse_results(response_text: str, count: int) -> List[Optional[ModerationResult]]:
+    """
+    Parse a JSON array answer into one entry per input text, in order.
+
+    Entries the model omitted or answered with an invalid object are None
+    so the caller can fail them individually.
+    """
+    parsed = json.loads(clean_json(response_text))
+    if not isinstance(parsed, list):
+        raise InvalidLLMResponseError("Expected a JSON array of moderation results")
+
+    results: List[Optional[ModerationResult]] = [None] * count
+    for item in parsed:
+        if not isinstance(item, dict):
+            continue
+        index = item.pop("index", None)
+        if not isinstance(index, int) or not 0 <= index < count:
+            continue
+        try:
+            results[index] = ModerationResult.model_validate(item)
+        except ValidationError:
+            continue
+    return results
+
+ImageSource = Union[bytes, str, BinaryIO]
+
+
+def load_image(image_source: ImageSource) -> dict:
+    """
+    Turn image bytes, a file handle, a local path or a URL into a Gemini blob.
+
+    The encoded bytes are sent as-is; only the header is parsed to detect the
+    MIME type, so the image is never decoded and re-encoded in process.
+    URLs are fetched through the pooled HTTP session with timeouts.
+    """
+    if isinstance(image_source, bytes):
+        data = image_source
+    elif isinstance(image_source, str) and image_source.startswith(("http://", "https://")):
+        data = fetch_url_bytes(image_source)
+    elif isinstance(image_source, str):
+        with open(image_source, "rb") as f:
+            data = f.read()
     else:
-        image = Image.open(image_source)
+        data = image_source.read()
 
-    prompt = """
-    You are a strict content moderator.
-    Look at this image and:
-    1. Classify it into one of: toxic, spam, harassment, safe.
-    2. Give a confidence score (0-1).
-    3. Explain your reasoning.
-    4. Describe what is shown in the image.
-    Respond strictly in JSON with keys: content_type, classification, confidence, reason, description.
+    with Image.open(BytesIO(data)) as img:
+        mime_type = img.get_format_mimetype() or "image/jpeg"
+    return {"mime_type": mime_type, "data": data}
+
+
+T = TypeVar("T")
+
+REQUEST_OPTIONS = {"timeout": config.LLM_TIMEOUT_SECONDS}
+
+
+def record_token_usage(response) -> None:
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return
+    llm_tokens.inc("prompt", getattr(usage, "prompt_token_count", 0) or 0)
+    llm_tokens.inc("completion", getattr(usage, "candidates_token_count", 0) or 0)
+
+
+async def generate_with_resilience_async(contents, parse: Callable[[str], T]) -> T:
     """
-    response = gemini_model.generate_content([prompt, image])
-    json_text = clean_json(response.text)
-    return ModerationResult.model_validate_json(json_text)
\ No newline at end of file
+    Call Gemini with a deadline, jittered retries on transient errors or
+    invalid JSON, the shared circuit breaker and the llm_limiter slots.
+
+    The breaker sees one outcome per call, after retries: a failure only if
+    the last attempt hit a provider error, otherwise a success or nothing.
+    """
+    llm_breaker.before_call()
+    outcome = llm_breaker.release_trial
+    try:
+        attempt = 0
+        while True:
+            try:
+                async with llm_limiter.slot():
+                    response = await asyncio.wait_for(
+                        gemini_model.generate_content_async(contents, request_options=REQUEST_OPTIONS),
+                        config.LLM_TIMEOUT_SECONDS,
+                    )
+                record_token_usage(response)
+                result = parse(response.text)
+            except TRANSIENT_ERRORS as e:
+                attempt += 1
+                if attempt > config.LLM_MAX_RETRIES:
+                    if isinstance(e, PROVIDER_ERRORS):
+                        outcome = llm_breaker.record_failure
+                    raise
+                logger.warning(f"Transient Gemini failure (attempt {attempt}): {e!r}")
+                await asyncio.sleep(retry_delay(attempt))
+                continue
+            outcome = llm_breaker.record_success
+            return result
+    finally:
+        # Runs on cancellation too, so a half-open trial slot is never left taken
+        outcome()
+
+
+async def classify_text_gemini_async(text: str) -> ModerationResult:
+    with timed("classify_text"):
+        return await generate_with_resilience_async(build_text_prompt(text), parse_result)
+
+async def classify_texts_gemini_async(texts: List[str]) -> List[Optional[ModerationResult]]:
+    with timed("classify_text"):
+        return await generate_with_resilience_async(build_texts_prompt(texts), lambda text: parse_results(text, len(texts)))
+
+async def classify_image_gemini_async(image_source: ImageSource) -> ModerationResult:
+    with timed("classify_image"):
+        if isinstance(image_source, bytes):
+            # Only the header is parsed, so this does not need a thread
+            image = load_image(image_source)
+        else:
+            image = await asyncio.to_thread(load_image, image_source)
+        return await generate_with_resilience_async([IMAGE_PROMPT, image], parse_result)
@@ -1,9 +1,20 @@
+import asyncio
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from src.api import moderation, analytics
-from src.database import Base, engine
+from src.api import moderation, analytics, history, metrics
+from src.database import engine, async_engine, SessionLocal
+from src.migrations import upgrade_schema
+from src.config import config
+from src.near_duplicate import near_duplicate_index
+from src.image_hash import image_hash_index
+from src.batching import text_batcher
+from src.persistence import write_behind
+from src.email_alerts import email_dispatcher
+from src.rollups import ensure_rollups
+from src.worker import in_process_workers
 import uvicorn
 
+from src.api.limits import BodySizeLimitMiddleware
 from src.api.errors import (
     ApiError,
     api_error_handler,
@@ -16,12 +27,47 @@ from starlette.exceptions import HTTPException as StarletteHTTPException
 
 from src.logger import logger
 
-Base.metadata.create_all(bind=engine)
+upgrade_schema(engine)
+
+def warm_dedup_indexes():
+    db = SessionLocal()
+    try:
+        if config.NEAR_DUP_ENABLED:
+            loaded = near_duplicate_index.warm(db, config.NEAR_DUP_WARM_LIMIT)
+            logger.info(f"Loaded {loaded} fingerprints into the near-duplicate index")
+        if config.IMAGE_DEDUP_ENABLED:
+            loaded = image_hash_index.warm(db, config.IMAGE_DEDUP_WARM_LIMIT)
+            logger.info(f"Loaded {loaded} perceptual hashes into the image dedup index")
+    except Exception as e:
+        logger.warning(f"Could not warm dedup indexes: {e}")
+    finally:
+        db.close()
+
+def backfill_rollups():
+    db = SessionLocal()
+    try:
+        ensure_rollups(db)
+    except Exception as e:
+        logger.warning(f"Could not backfill analytics rollups: {e}")
+    finally:
+        db.close()
 
 @asynccontextmanager
 async def lifespan(_app: FastAPI):
     logger.info("Starting up Smart Content Moderator API...")
+    await asyncio.to_thread(backfill_rollups)
+    await asyncio.to_thread(warm_dedup_indexes)
+    if config.TEXT_BATCHING_ENABLED:
+        text_batcher.start()
+    write_behind.start()
+    if config.JOB_WORKERS_IN_PROCESS > 0:
+        in_process_workers.start()
     yield
+    await in_process_workers.stop()
+    await text_batcher.stop()
+    await email_dispatcher.stop()
+    await write_behind.stop()
+    await async_engine.dispose()
     logger.info("Shutting down Smart Content Moderator API...")
 
 app = FastAPI(title="Smart Content Moderator API", lifespan=lifespan)
@@ -29,8 +75,18 @@ app = FastAPI(title="Smart Content Moderator API", lifespan=lifespan)
 # Include routers
 app.include_router(moderation.router, prefix="/api/v1/moderate", tags=["Moderation"])
 app.include_router(analytics.router, prefix="/api/v1/analytics", tags=["Analytics"])
+app.include_router(history.router, prefix="/api/v1/history", tags=["History"])
+app.include_router(metrics.router, tags=["Metrics"])
 
 
+# Reject oversized image uploads before the multipart parser spools them
+# (the extra 64 KiB leaves room for the form fields and multipart boundaries)
+app.add_middleware(
+    BodySizeLimitMiddleware,
+    max_bytes=config.MAX_IMAGE_BYTES + 64 * 1024,
+    path_prefixes=["/api/v1/moderate/image"],
+)
+
 # Add exception handlers
 app.add_exception_handler(ApiError, api_error_handler)
 app.add_exception_handler(RequestValidationError, validation_exception_handler)
@@ -0,0 +1,199 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List, Tuple
+
+# Seconds; spans cache hits (~ms) through slow LLM calls and uploads
+STAGE_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30]
+
+
+def escape_label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{escape_label(value)}"' for key, value in labels.items()) + "}"
+
+
+def format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram with cumulative counts, in the style of Prometheus.
+    """
+
+    def __init__(self, buckets):
+        self.buckets = sorted(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        with self._lock:
+            self._counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._sum += value
+            self._count += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            cumulative, running = {}, 0
+            for bound, count in zip(self.buckets, self._counts):
+                running += count
+                cumulative[str(bound)] = running
+            cumulative["+Inf"] = self._count
+            return {"buckets": cumulative, "sum": self._sum, "count": self._count}
+
+    def samples(self, name: str, labels: Dict[str, str]) -> List[str]:
+        """
+        Prometheus text exposition lines (_bucket, _sum, _count) for this histogram.
+        """
+        snapshot = self.snapshot()
+        lines = [
+            f"{name}_bucket{format_labels({**labels, 'le': bound})} {count}"
+            for bound, count in snapshot["buckets"].items()
+        ]
+        lines.append(f"{name}_sum{format_labels(labels)} {format_value(snapshot['sum'])}")
+        lines.append(f"{name}_count{format_labels(labels)} {snapshot['count']}")
+        return lines
+
+
+class HistogramFamily:
+    """
+    Histograms sharing a name and buckets, one per label value (e.g. per pipeline stage).
+    """
+
+    def __init__(self, name: str, help_text: str, label: str, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self.buckets = buckets
+        self._children: Dict[str, Histogram] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, value: str) -> Histogram:
+        with self._lock:
+            histogram = self._children.get(value)
+            if histogram is None:
+                histogram = self._children[value] = Histogram(self.buckets)
+            return histogram
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            children = dict(self._children)
+        return {value: histogram.snapshot() for value, histogram in sorted(children.items())}
+
+    def render(self) -> List[str]:
+        with self._lock:
+            children = dict(self._children)
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for value, histogram in sorted(children.items()):
+            lines.extend(histogram.samples(self.name, {self.label: value}))
+        return lines
+
+
+class Counter:
+    """
+    Monotonic counter keyed by one label value.
+    """
+
+    def __init__(self, name: str, help_text: str, label: str):
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self._values: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, value: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[value] = self._values.get(value, 0) + amount
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return dict(sorted(self._values.items()))
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        for value, total in self.snapshot().items():
+            lines.append(f"{self.name}{format_labels({self.label: value})} {format_value(total)}")
+        return lines
+
+
+Sample = Tuple[Dict[str, str], float]
+
+
+def render_samples(name: str, help_text: str, kind: str, samples: Iterable[Sample]) -> List[str]:
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+    lines.extend(f"{name}{format_labels(labels)} {format_value(value)}" for labels, value in samples)
+    return lines
+
+
+class MetricsRegistry:
+    """
+    Renders the Prometheus text format from registered families and scrape-time collectors.
+
+    Collectors are callables returning (labels, value) samples; they read the
+    live state of queues, pools and caches when /metrics is scraped, so the
+    hot paths never pay for gauges.
+    """
+
+    def __init__(self):
+        self._families: list = []
+        self._collectors: List[Tuple[str, str, str, Callable[[], Iterable[Sample]]]] = []
+
+    def register(self, family):
+        self._families.append(family)
+        return family
+
+    def collector(self, name: str, help_text: str, kind: str, collect: Callable[[], Iterable[Sample]]) -> None:
+        self._collectors.append((name, help_text, kind, collect))
+
+    def render(self) -> str:
+        lines = []
+        for family in self._families:
+            lines.extend(family.render())
+        for name, help_text, kind, collect in self._collectors:
+            lines.extend(render_samples(name, help_text, kind, collect()))
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+stage_latency = registry.register(HistogramFamily(
+    "moderation_stage_duration_seconds",
+    "Latency of moderation pipeline stages.",
+    "stage",
+    STAGE_BUCKETS,
+))
+stage_errors = registry.register(Counter(
+    "moderation_stage_errors_total",
+    "Moderation pipeline stages that raised.",
+    "stage",
+))
+llm_tokens = registry.register(Counter(
+    "moderation_llm_tokens_total",
+    "Gemini tokens used, by prompt and completion.",
+    "kind",
+))
+
+
+@contextmanager
+def timed(stage: str) -> Iterator[None]:
+    """
+    Record the duration of the enclosed block under the given stage; works in sync and async code.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        stage_errors.inc(stage)
+        raise
+    finally:
+        stage_latency.labels(stage).observe(time.perf_counter() - started)
@@ -0,0 +1,76 @@
+from typing import List
+
+from sqlalchemy import Enum, inspect, text
+from sqlalchemy.engine import Engine
+
+from src import models  # noqa: F401  registers every table on Base.metadata
+from src.database import Base, engine
+from src.logger import logger
+
+
+def _upgrade_enum_types(bind: Engine) -> List[str]:
+    enum_types = {}
+    for table in Base.metadata.sorted_tables:
+        for column in table.columns:
+            if isinstance(column.type, Enum) and column.type.native_enum:
+                enum_types[column.type.name] = column.type.enums
+
+    applied = []
+    # ALTER TYPE ... ADD VALUE cannot run inside a transaction block before PostgreSQL 12
+    with bind.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for name, values in enum_types.items():
+            existing = set(conn.execute(
+                text("SELECT e.enumlabel FROM pg_enum e JOIN pg_type t ON t.oid = e.enumtypid WHERE t.typname = :name"),
+                {"name": name},
+            ).scalars())
+            for value in values:
+                if value in existing:
+                    continue
+                quoted = value.replace("'", "''")
+                conn.execute(text(f"ALTER TYPE {bind.dialect.identifier_preparer.quote(name)} ADD VALUE '{quoted}'"))
+                applied.append(f"added value '{value}' to enum {name}")
+    return applied
+
+
+def upgrade_schema(bind: Engine) -> List[str]:
+    """
+    Bring an existing database up to the current models.
+
+    New tables are created with their indexes. Existing tables get any
+    missing (nullable) columns added and any missing indexes created, which
+    create_all() alone never does; on PostgreSQL, new values of native enum
+    types are added too. Returns a description of each change.
+    """
+    Base.metadata.create_all(bind=bind)
+    applied = _upgrade_enum_types(bind) if bind.dialect.name == "postgresql" else []
+
+    inspector = inspect(bind)
+    preparer = bind.dialect.identifier_preparer
+    with bind.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            existing_columns = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing_columns:
+                    continue
+                column_type = column.type.compile(dialect=bind.dialect)
+                conn.execute(text(
+                    f"ALTER TABLE {preparer.quote(table.name)} "
+                    f"ADD COLUMN {preparer.quote(column.name)} {column_type}"
+                ))
+                applied.append(f"added column {table.name}.{column.name}")
+
+            existing_indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name in existing_indexes:
+                    continue
+                index.create(conn)
+                applied.append(f"created index {index.name}")
+
+    for change in applied:
+        logger.info(f"Schema upgrade: {change}")
+    return applied
+
+
+if __name__ == "__main__":
+    changes = upgrade_schema(engine)
+    print("\n".join(changes) if changes else "Schema is up to date")
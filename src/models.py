@@ -1,18 +1,40 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Float, JSON, Enum
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Float, JSON, Enum, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from datetime import datetime, timezone
 from src.database import Base
 
+
+def utcnow() -> datetime:
+    """
+    Current UTC time as a naive datetime.
+
+    DateTime columns are timezone-naive and hold UTC; asyncpg rejects aware
+    values for them, so every default and bound timestamp goes through here.
+    """
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
 class ModerationRequest(Base):
     __tablename__ = "moderation_requests"
+    __table_args__ = (
+        # Per-user history, summaries and "last request" lookups
+        Index("ix_moderation_requests_email_created_at", "email", "created_at"),
+        Index("ix_moderation_requests_email_content_type", "email", "content_type"),
+        # Verdict cache: content_hash IN (...) AND content_type = 'text' AND created_at >= ?
+        Index("ix_moderation_requests_content_hash", "content_hash", "content_type", "created_at"),
+        # Dedup index warm-up: most recent requests of one content type
+        Index("ix_moderation_requests_content_type_created_at", "content_type", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     email = Column(String, nullable=False)
     content_type = Column(String, nullable=False)  
     content_url = Column(String, nullable=True)    
     content_hash = Column(String, nullable=True)        
+    simhash = Column(String(16), nullable=True)
+    perceptual_hash = Column(String(16), nullable=True)
     status = Column(Enum("pending", "completed", name="notification_status"), default="pending")  
-    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    created_at = Column(DateTime, default=utcnow)
 
     # Relationships
     results = relationship("ModerationResult", back_populates="request", cascade="all, delete-orphan")
@@ -28,6 +50,9 @@ class ModerationRequest(Base):
 
 class ModerationResult(Base):
     __tablename__ = "moderation_results"
+    __table_args__ = (
+        Index("ix_moderation_results_request_id", "request_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     request_id = Column(Integer, ForeignKey("moderation_requests.id"), nullable=False)
@@ -41,11 +66,104 @@ class ModerationResult(Base):
 
 class NotificationLog(Base):
     __tablename__ = "notification_logs"
+    __table_args__ = (
+        Index("ix_notification_logs_request_id_sent_at", "request_id", "sent_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     request_id = Column(Integer, ForeignKey("moderation_requests.id"), nullable=False)
     channel = Column(String, nullable=False)         
-    status = Column(Enum("pending", "send", name="moderation_status"), default="pending")      
-    sent_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    # What was sent, e.g. "summary" or "moderation_result"; dedup only looks at its own kind
+    kind = Column(String, nullable=True)
+    status = Column(Enum("pending", "send", "failed", name="moderation_status"), default="pending")      
+    sent_at = Column(DateTime, default=utcnow)
+    transport = Column(String, nullable=True)
+    latency_ms = Column(Float, nullable=True)
+    provider_message_id = Column(String, nullable=True)
+    error = Column(String, nullable=True)
 
     request = relationship("ModerationRequest", back_populates="notifications")
+
+
+class ModerationJob(Base):
+    __tablename__ = "moderation_jobs"
+    __table_args__ = (
+        # Lease query: pending jobs that are due, or leased jobs whose lease expired
+        Index("ix_moderation_jobs_status_available_at", "status", "available_at"),
+        Index("ix_moderation_jobs_status_lease_expires_at", "status", "lease_expires_at"),
+        # Status endpoint and subscriptions: latest job of a request
+        Index("ix_moderation_jobs_request_id_kind", "request_id", "kind"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    request_id = Column(Integer, ForeignKey("moderation_requests.id"), nullable=False)
+    kind = Column(String, nullable=False, default="image")
+    payload_path = Column(String, nullable=True)
+    status = Column(Enum("pending", "leased", "done", "dead", name="job_status"), default="pending", nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    max_attempts = Column(Integer, nullable=False)
+    available_at = Column(DateTime, default=utcnow, nullable=False)
+    lease_expires_at = Column(DateTime, nullable=True)
+    leased_by = Column(String, nullable=True)
+    last_error = Column(String, nullable=True)
+    created_at = Column(DateTime, default=utcnow)
+    updated_at = Column(DateTime, default=utcnow)
+
+    request = relationship("ModerationRequest")
+
+
+class AnalyticsRollup(Base):
+    """
+    Per-user counters for the analytics summary, maintained on every flush.
+
+    Rows with classification "*" count requests of a content type; the
+    other rows count results per classification.
+    """
+    __tablename__ = "analytics_rollups"
+    __table_args__ = (
+        UniqueConstraint("email", "content_type", "classification", name="uq_analytics_rollup_key"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    email = Column(String, nullable=False)
+    content_type = Column(String, nullable=False)
+    classification = Column(String, nullable=False)
+    count = Column(Integer, nullable=False, default=0)
+    last_request_at = Column(DateTime, nullable=True)
+    last_request_id = Column(Integer, nullable=True)
+
+
+class NotificationClaim(Base):
+    """
+    One row per user, notification kind and dedup window. Inserting it in
+    the same transaction that queues the notification lets only one of
+    several concurrent requests queue it.
+    """
+    __tablename__ = "notification_claims"
+    __table_args__ = (
+        UniqueConstraint("email", "kind", "window_start", name="uq_notification_claim_key"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    email = Column(String, nullable=False)
+    kind = Column(String, nullable=False)
+    window_start = Column(DateTime, nullable=False)
+    created_at = Column(DateTime, default=utcnow)
+
+
+class BulkIngestRun(Base):
+    """
+    Progress of one bulk ingest; checkpoint is the last input item whose
+    verdict (and every earlier one) has been committed.
+    """
+    __tablename__ = "bulk_ingest_runs"
+
+    id = Column(Integer, primary_key=True)
+    email = Column(String, nullable=False)
+    format = Column(String, nullable=False)
+    status = Column(Enum("running", "interrupted", "completed", name="bulk_ingest_status"), default="running", nullable=False)
+    checkpoint = Column(Integer, nullable=False, default=0)
+    completed_items = Column(Integer, nullable=False, default=0)
+    failed_items = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, default=utcnow)
+    updated_at = Column(DateTime, default=utcnow)
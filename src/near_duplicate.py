@@ -0,0 +1,176 @@
+import hashlib
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Optional
+
+from sqlalchemy.orm import Session
+
+from src import models, schemas
+from src.cache import verdict_from_result
+from src.config import config
+
+FINGERPRINT_BITS = 64
+
+URL_PATTERN = re.compile(r"(?:https?://|www\.)\S+|\b[\w-]+(?:\.[\w-]+)+/\S*", re.IGNORECASE)
+ZERO_WIDTH_CHARS = dict.fromkeys(map(ord, "\u00ad\u180e\u200b\u200c\u200d\u200e\u200f\u2060\u2061\u2062\u2063\u2064\ufeff"))
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normalize text so that trivially different submissions compare equal.
+
+    Applies NFKC folding, strips zero-width characters, lowercases,
+    replaces URLs with a placeholder token, drops emoji and symbols and
+    collapses whitespace.
+    """
+    text = unicodedata.normalize("NFKC", text).translate(ZERO_WIDTH_CHARS).casefold()
+    text = URL_PATTERN.sub(" urltoken ", text)
+
+    chars = []
+    for ch in text:
+        category = unicodedata.category(ch)
+        if category[0] in ("L", "N"):
+            chars.append(ch)
+        elif category[0] in ("S", "C"):
+            continue
+        else:
+            chars.append(" ")
+    return " ".join("".join(chars).split())
+
+
+def _feature_hash(feature: str) -> int:
+    return int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def simhash(normalized: str) -> Optional[int]:
+    """
+    Compute a 64-bit SimHash over word unigrams and bigrams of normalized text.
+
+    Returns None when the text is too short for a meaningful fingerprint.
+    """
+    tokens = normalized.split()
+    if len(tokens) < config.NEAR_DUP_MIN_TOKENS:
+        return None
+
+    features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    weights = [0] * FINGERPRINT_BITS
+    for feature in features:
+        h = _feature_hash(feature)
+        for bit in range(FINGERPRINT_BITS):
+            weights[bit] += 1 if (h >> bit) & 1 else -1
+
+    fingerprint = 0
+    for bit, weight in enumerate(weights):
+        if weight > 0:
+            fingerprint |= 1 << bit
+    return fingerprint
+
+
+def fingerprint_to_hex(fingerprint: int) -> str:
+    return f"{fingerprint:016x}"
+
+
+class NearDuplicateIndex:
+    """
+    In-memory SimHash index that finds prior verdicts within a Hamming distance.
+
+    Fingerprints are split into max_distance + 1 bands; by the pigeonhole
+    principle any fingerprint within max_distance bits shares at least one
+    band exactly, so only those candidates need a full distance check.
+    """
+
+    def __init__(self, max_distance: int, max_entries: int):
+        self.max_distance = max_distance
+        self.max_entries = max_entries
+        band_count = max_distance + 1
+        width = FINGERPRINT_BITS // band_count
+        self._bands = [
+            (i * width, FINGERPRINT_BITS if i == band_count - 1 else (i + 1) * width)
+            for i in range(band_count)
+        ]
+        self._buckets: list[dict[int, set[int]]] = [dict() for _ in self._bands]
+        self._entries: "OrderedDict[int, schemas.ModerationResult]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    def _band_values(self, fingerprint: int):
+        for start, end in self._bands:
+            yield (fingerprint >> start) & ((1 << (end - start)) - 1)
+
+    def find(self, fingerprint: int) -> Optional[schemas.ModerationResult]:
+        """
+        Return the verdict of the closest indexed fingerprint within max_distance.
+        """
+        with self._lock:
+            best, best_distance = None, self.max_distance + 1
+            for buckets, value in zip(self._buckets, self._band_values(fingerprint)):
+                for candidate in buckets.get(value, ()):
+                    distance = (candidate ^ fingerprint).bit_count()
+                    if distance < best_distance:
+                        best, best_distance = candidate, distance
+            if best is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(best)
+            self.hits += 1
+            return self._entries[best]
+
+    def add(self, fingerprint: int, result: schemas.ModerationResult) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            if fingerprint not in self._entries:
+                for buckets, value in zip(self._buckets, self._band_values(fingerprint)):
+                    buckets.setdefault(value, set()).add(fingerprint)
+            self._entries[fingerprint] = result
+            self._entries.move_to_end(fingerprint)
+            while len(self._entries) > self.max_entries:
+                evicted, _ = self._entries.popitem(last=False)
+                self._remove_from_buckets(evicted)
+
+    def _remove_from_buckets(self, fingerprint: int) -> None:
+        for buckets, value in zip(self._buckets, self._band_values(fingerprint)):
+            bucket = buckets.get(value)
+            if bucket is not None:
+                bucket.discard(fingerprint)
+                if not bucket:
+                    del buckets[value]
+
+    def warm(self, db: Session, limit: int) -> int:
+        """
+        Load the most recent text fingerprints and verdicts from the database.
+        """
+        rows = (
+            db.query(models.ModerationRequest.simhash, models.ModerationResult)
+              .join(models.ModerationResult, models.ModerationResult.request_id == models.ModerationRequest.id)
+              .filter(
+                  models.ModerationRequest.content_type == "text",
+                  models.ModerationRequest.simhash.isnot(None),
+              )
+              .order_by(models.ModerationRequest.created_at.desc())
+              .limit(limit)
+              .all()
+        )
+        # Oldest first so the most recent verdicts end up most recently used
+        for fingerprint_hex, row in reversed(rows):
+            self.add(int(fingerprint_hex, 16), verdict_from_result(row, "text"))
+        return len(rows)
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "max_distance": self.max_distance,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+near_duplicate_index = NearDuplicateIndex(
+    max_distance=config.NEAR_DUP_MAX_HAMMING,
+    max_entries=config.NEAR_DUP_MAX_ENTRIES,
+)
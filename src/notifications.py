@@ -0,0 +1,208 @@
+import asyncio
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import delete, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src import models
+from src.config import config
+from src.database import AsyncSessionLocal
+from src.email_alerts import DeliveryResult, email_dispatcher
+from src.email_template import analytics_email_html
+from src.jobs import enqueue_job, utcnow
+from src.logger import logger
+from src.persistence import write_behind
+from src.rollups import UPSERT_DIALECTS, load_summary
+
+SUMMARY_EMAIL_JOB = "summary_email"
+
+# NotificationLog.kind values
+SUMMARY_EMAIL = "summary"
+RESULT_EMAIL = "moderation_result"
+
+
+class TokenBucket:
+    """
+    Async token bucket: acquire() waits until a token is available.
+    """
+
+    def __init__(self, rate_per_second: float, burst: int):
+        self.rate = rate_per_second
+        self.capacity = max(1, burst)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock: Optional[asyncio.Lock] = None
+
+        self.waited = 0
+
+    async def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                self.waited += 1
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def stats(self) -> dict:
+        return {"rate_per_second": self.rate, "burst": self.capacity, "waited": self.waited}
+
+
+# Per-channel send rate limits, shared by every worker in this process
+channel_limiters = {
+    "email": TokenBucket(config.NOTIFY_EMAIL_RATE_PER_SECOND, config.NOTIFY_EMAIL_BURST),
+}
+
+
+async def deliver_email(
+    request_id: int,
+    kind: str,
+    to_email: str,
+    subject: str,
+    html_content: str,
+    wait_for_log: bool = False,
+) -> DeliveryResult:
+    """
+    Send one email of the given kind through the batching dispatcher and
+    record the outcome, transport and latency in a NotificationLog row.
+
+    The log row goes through the write-behind buffer; wait_for_log waits
+    until it is committed (needed when later reads depend on it).
+    """
+    result = await email_dispatcher.send(to_email, subject, html_content)
+    log = models.NotificationLog(
+        request_id=request_id,
+        channel="email",
+        kind=kind,
+        status="send" if result.ok else "failed",
+        sent_at=utcnow(),
+        transport=result.transport,
+        latency_ms=result.latency_ms,
+        provider_message_id=result.message_id,
+        error=result.error,
+    )
+    if wait_for_log:
+        await write_behind.write(log)
+    else:
+        write_behind.enqueue(log)
+    return result
+
+
+async def claim_notification(db: AsyncSession, user: str, kind: str) -> bool:
+    """
+    Claim the current dedup window for a user's notification in the caller's
+    transaction. Returns False if another request already claimed it; the
+    unique key makes this hold across concurrent requests and processes.
+    """
+    window = max(1, config.NOTIFY_DEDUP_WINDOW_SECONDS)
+    epoch = datetime(1970, 1, 1)
+    window_start = epoch + timedelta(seconds=int((utcnow() - epoch).total_seconds()) // window * window)
+    claims = models.NotificationClaim.__table__
+
+    # Earlier windows can no longer conflict
+    await db.execute(delete(claims).where(claims.c.email == user, claims.c.kind == kind, claims.c.window_start < window_start))
+    values = {"email": user, "kind": kind, "window_start": window_start, "created_at": utcnow()}
+    dialect_insert = UPSERT_DIALECTS.get(db.bind.dialect.name)
+    if dialect_insert is not None:
+        result = await db.execute(dialect_insert(claims).values(**values).on_conflict_do_nothing())
+        return result.rowcount > 0
+    try:
+        async with db.begin_nested():
+            await db.execute(claims.insert().values(**values))
+    except IntegrityError:
+        return False
+    return True
+
+
+async def enqueue_summary_email(db: AsyncSession, user: str) -> tuple[bool, str]:
+    """
+    Queue an analytics summary email unless one is already queued or was sent
+    to this user within the dedup window. Returns (queued, reason).
+    """
+    user_requests = select(models.ModerationRequest.id).where(models.ModerationRequest.email == user)
+
+    already_queued = await db.scalar(
+        select(models.ModerationJob.id)
+        .where(
+            models.ModerationJob.kind == SUMMARY_EMAIL_JOB,
+            models.ModerationJob.status.in_(("pending", "leased")),
+            models.ModerationJob.request_id.in_(user_requests),
+        )
+        .limit(1)
+    )
+    if already_queued is not None:
+        return False, "A summary email is already queued for this user"
+
+    window_start = utcnow() - timedelta(seconds=config.NOTIFY_DEDUP_WINDOW_SECONDS)
+    recently_sent = await db.scalar(
+        select(models.NotificationLog.id)
+        .where(
+            models.NotificationLog.request_id.in_(user_requests),
+            models.NotificationLog.channel == "email",
+            models.NotificationLog.kind == SUMMARY_EMAIL,
+            models.NotificationLog.status == "send",
+            models.NotificationLog.sent_at >= window_start,
+        )
+        .limit(1)
+    )
+    if recently_sent is not None:
+        return False, "A summary email was already sent to this user recently"
+
+    summary = await load_summary(db, user)
+    if summary["last_request_id"] is None:
+        return False, "No moderation requests found for this user"
+
+    if not await claim_notification(db, user, SUMMARY_EMAIL):
+        await db.rollback()
+        return False, "A summary email is already queued for this user"
+
+    # Jobs reference a request; the user's latest one also receives the notification log
+    enqueue_job(db, summary["last_request_id"], payload_path=None, kind=SUMMARY_EMAIL_JOB)
+    await db.commit()
+    return True, "Summary email queued"
+
+
+async def send_summary_email(request_id: int, payload_path: Optional[str]) -> None:
+    """
+    Job handler: render the user's current summary, send it and log the notification.
+
+    Raises on delivery failure so the job queue retries with backoff.
+    """
+    async with AsyncSessionLocal() as db:
+        req = await db.get(models.ModerationRequest, request_id)
+        if req is None:
+            raise LookupError(f"Moderation request with id {request_id} not found")
+        user = req.email
+        summary = await load_summary(db, user)
+
+    html_content = analytics_email_html(
+        user=user,
+        total_requests=summary["total_requests"],
+        text_counts=summary["counts"]["text"],
+        image_counts=summary["counts"]["image"],
+        last_request_at=summary["last_request_at"]
+    )
+
+    await channel_limiters["email"].acquire()
+    # The log is committed before the job completes so the dedup window sees it
+    result = await deliver_email(
+        request_id,
+        SUMMARY_EMAIL,
+        to_email=user,
+        subject="📊 Your Moderation Analytics Summary",
+        html_content=html_content,
+        wait_for_log=True,
+    )
+    if not result.ok:
+        raise RuntimeError(f"Summary email to {user} failed: {result.error}")
+    logger.info(f"Analytics summary email sent to {user} via {result.transport} in {result.latency_ms:.0f}ms")
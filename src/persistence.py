@@ -0,0 +1,192 @@
+import asyncio
+import time
+from collections import defaultdict
+from typing import Optional
+
+from sqlalchemy import insert, inspect
+
+from src.config import config
+from src.database import AsyncSessionLocal
+from src.logger import logger
+from src.metrics import Histogram, timed
+
+_STOP = object()
+
+
+class WriteBehindWriter:
+    """
+    Buffers ORM rows from concurrent requests and writes them in large transactions.
+
+    A background loop collects queued rows for up to max_wait_ms or
+    max_rows and flushes them in one transaction. Callers of write() wait
+    until that commit succeeds, so primary keys and defaults are populated
+    on the objects they handed in. Rows passed to enqueue() are
+    fire-and-forget and go out as bulk INSERTs grouped by table. If the
+    batch transaction fails, each write() call and enqueue() group is
+    retried in its own transaction so only the bad rows are lost.
+    """
+
+    def __init__(self, max_wait_ms: float, max_rows: int):
+        self.max_wait = max_wait_ms / 1000
+        self.max_rows = max(1, max_rows)
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._loop_task: Optional[asyncio.Task] = None
+
+        self.flush_latency_histogram = Histogram([0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5])
+        self.flush_rows_histogram = Histogram([1, 5, 10, 25, 50, 100, 250, 500, 1000])
+        self.queue_depth_histogram = Histogram([0, 1, 5, 10, 25, 50, 100, 250, 1000])
+        self.flushes = 0
+        self.rows = 0
+        self.failed_flushes = 0
+        self.dropped_rows = 0
+
+    def start(self) -> None:
+        if self._loop_task is not None and not self._loop_task.done():
+            return
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        self._loop_task = asyncio.create_task(self._run())
+        logger.info(f"Write-behind writer started (max_wait={self.max_wait * 1000:.0f}ms, max_rows={self.max_rows})")
+
+    async def stop(self) -> None:
+        """
+        Stop the flush loop and write out everything still buffered.
+        """
+        if self._loop_task is not None:
+            # A sentinel rather than cancel(), so a batch being collected or committed is not lost
+            self._queue.put_nowait(_STOP)
+            await self._loop_task
+            self._loop_task = None
+
+        leftover = []
+        while self._queue is not None and not self._queue.empty():
+            item = self._queue.get_nowait()
+            if item is not _STOP:
+                leftover.append(item)
+        if leftover:
+            logger.info(f"Flushing {len(leftover)} buffered writes on shutdown")
+            await self._flush(leftover)
+
+    async def write(self, *instances) -> None:
+        """
+        Queue instances for the next flush and wait until they are committed.
+        """
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((instances, future))
+        await future
+
+    def enqueue(self, *instances) -> None:
+        """
+        Queue instances for the next flush without waiting for the commit.
+        """
+        self.start()
+        self._queue.put_nowait((instances, None))
+
+    async def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is _STOP:
+                return
+            batch = [item]
+            rows = len(item[0])
+            deadline = time.monotonic() + self.max_wait
+            while rows < self.max_rows:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+                rows += len(item[0])
+            await self._flush(batch)
+
+    @staticmethod
+    def _row_values(instance) -> dict:
+        # Only set columns are sent, so Python-side column defaults still apply
+        values = {}
+        for attr in inspect(instance).mapper.column_attrs:
+            value = getattr(instance, attr.key)
+            if value is not None:
+                values[attr.key] = value
+        return values
+
+    async def _commit(self, batch) -> None:
+        awaited = [instance for items, future in batch if future is not None for instance in items]
+        bulk = defaultdict(list)
+        for items, future in batch:
+            if future is None:
+                for instance in items:
+                    bulk[type(instance)].append(self._row_values(instance))
+
+        async with AsyncSessionLocal() as db:
+            db.add_all(awaited)
+            await db.flush()
+            for model, rows in bulk.items():
+                await db.execute(insert(model), rows)
+            with timed("db_commit"):
+                await db.commit()
+
+    def _committed(self, batch) -> None:
+        row_count = sum(len(items) for items, _ in batch)
+        self.flushes += 1
+        self.rows += row_count
+        self.flush_rows_histogram.observe(row_count)
+        for _, future in batch:
+            if future is not None and not future.done():
+                future.set_result(None)
+
+    async def _flush(self, batch) -> None:
+        self.queue_depth_histogram.observe(self._queue.qsize())
+        started = time.perf_counter()
+        try:
+            await self._commit(batch)
+        except Exception as e:
+            self.failed_flushes += 1
+            row_count = sum(len(items) for items, _ in batch)
+            logger.warning(f"Write-behind flush of {row_count} rows failed, retrying each write on its own: {e}")
+        else:
+            self._committed(batch)
+            return
+        finally:
+            self.flush_latency_histogram.observe(time.perf_counter() - started)
+
+        # One bad row must not fail every caller in the batch or drop the fire-and-forget rows
+        for items, future in batch:
+            try:
+                await self._commit([(items, future)])
+            except Exception as e:
+                self.failed_flushes += 1
+                if future is None:
+                    self.dropped_rows += len(items)
+                    logger.error(f"Write-behind dropped {len(items)} rows: {e}")
+                elif not future.done():
+                    future.set_exception(e)
+            else:
+                self._committed([(items, future)])
+
+    def stats(self) -> dict:
+        return {
+            "write_behind_text": config.WRITE_BEHIND_ENABLED,
+            "flushes": self.flushes,
+            "rows": self.rows,
+            "failed_flushes": self.failed_flushes,
+            "dropped_rows": self.dropped_rows,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "flush_latency_seconds": self.flush_latency_histogram.snapshot(),
+            "rows_per_flush": self.flush_rows_histogram.snapshot(),
+            "queue_depth_at_flush": self.queue_depth_histogram.snapshot(),
+        }
+
+
+write_behind = WriteBehindWriter(
+    max_wait_ms=config.WRITE_BEHIND_MAX_WAIT_MS,
+    max_rows=config.WRITE_BEHIND_MAX_ROWS,
+)
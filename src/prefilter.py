@@ -0,0 +1,295 @@
+import importlib
+import re
+import threading
+from collections import deque
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from src.config import config
+from src.logger import logger
+from src.schemas import ModerationResult
+
+# Link shorteners are almost never used in legitimate comments on our platforms.
+# Phrases ending in "/" are URL hosts and only match at the start of a host.
+DEFAULT_SPAM_PHRASES = [
+    "bit.ly/", "tinyurl.com/", "goo.gl/", "t.co/", "ow.ly/", "is.gd/", "buff.ly/", "cutt.ly/", "shorturl.at/",
+]
+
+SAFE_GREETING_PATTERN = re.compile(
+    r"^\s*(hi|hii+|hello|hey|heya|yo|thanks|thank you|thx|ty|good (morning|afternoon|evening|night)|"
+    r"ok|okay|cool|nice|great|congrats|congratulations|welcome|lol)(\s+(all|everyone|guys|there|team|so much))?"
+    r"[\s!.?:)]*$",
+    re.IGNORECASE,
+)
+
+
+class AhoCorasick:
+    """
+    Aho-Corasick automaton for matching many phrases in one pass over the text.
+    """
+
+    def __init__(self, phrases: Iterable[str]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[str]] = [[]]
+        for phrase in phrases:
+            self._add(phrase.lower())
+        self._build()
+
+    def _add(self, phrase: str) -> None:
+        if not phrase:
+            return
+        state = 0
+        for ch in phrase:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            state = nxt
+        self._output[state].append(phrase)
+
+    def _build(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fallback = self._fail[state]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                # Children of the root always fall back to the root itself
+                self._fail[nxt] = self._goto[fallback].get(ch, 0) if state else 0
+                self._output[nxt] = self._output[nxt] + self._output[self._fail[nxt]]
+
+    def find(self, text: str) -> List[Tuple[int, str]]:
+        """
+        Return (start, phrase) for every occurrence in text, which must already be lowercased.
+        """
+        matches = []
+        state = 0
+        for end, ch in enumerate(text):
+            while state and ch not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(ch, 0)
+            for phrase in self._output[state]:
+                matches.append((end - len(phrase) + 1, phrase))
+        return matches
+
+
+def _is_word_char(ch: str) -> bool:
+    return ch.isalnum() or ch == "_"
+
+
+# Characters that continue a host name, so a URL phrase after them is only the tail of another host
+HOST_CHARS = frozenset("-._@")
+
+
+def _starts_host(text: str, start: int) -> bool:
+    """
+    Whether a host begins at start: at the start of the text, after whitespace
+    or punctuation such as '://' or '(', or after a leading 'www.'.
+    """
+    if text.endswith("www.", 0, start):
+        start -= 4
+    if start == 0:
+        return True
+    before = text[start - 1]
+    return not (_is_word_char(before) or before in HOST_CHARS)
+
+
+def _is_whole_phrase(text: str, start: int, phrase: str) -> bool:
+    if phrase.endswith("/"):
+        return _starts_host(text, start)
+    end = start + len(phrase)
+    # Word boundaries, like regex \b: only checked where the phrase itself starts or ends with a word character
+    if _is_word_char(phrase[0]) and start > 0 and _is_word_char(text[start - 1]):
+        return False
+    if _is_word_char(phrase[-1]) and end < len(text) and _is_word_char(text[end]):
+        return False
+    return True
+
+
+def _result(classification: str, confidence: float, reason: str, description: str) -> ModerationResult:
+    return ModerationResult(
+        content_type="text",
+        classification=classification,
+        confidence=confidence,
+        reason=reason,
+        description=description,
+    )
+
+
+class KeywordTier:
+    """
+    Flags texts containing blocklisted phrases, each mapped to a classification.
+    """
+
+    name = "keyword"
+
+    def __init__(self, phrases: Dict[str, str], confidence: float = 0.95):
+        self.phrases = {phrase.lower(): classification for phrase, classification in phrases.items()}
+        self.confidence = confidence
+        self._automaton = AhoCorasick(self.phrases)
+
+    def classify(self, text: str) -> Optional[ModerationResult]:
+        lowered = text.lower()
+        matches = [phrase for start, phrase in self._automaton.find(lowered) if _is_whole_phrase(lowered, start, phrase)]
+        if not matches:
+            return None
+        phrase = max(matches, key=len)
+        classification = self.phrases[phrase]
+        return _result(
+            classification,
+            self.confidence,
+            f"Matched blocklisted phrase '{phrase}'",
+            f"Text contains a phrase associated with {classification} content.",
+        )
+
+
+class RegexTier:
+    """
+    Applies ordered regex rules; the first matching rule decides.
+    """
+
+    name = "regex"
+
+    def __init__(self, rules: List[Tuple[re.Pattern, str, float, str]]):
+        self.rules = rules
+
+    def classify(self, text: str) -> Optional[ModerationResult]:
+        for pattern, classification, confidence, reason in self.rules:
+            if pattern.search(text):
+                return _result(classification, confidence, reason, "Short text matched a local pre-filter rule.")
+        return None
+
+
+class CallableTier:
+    """
+    Wraps a local model given as a callable returning (classification, confidence) or None.
+    """
+
+    def __init__(self, name: str, predict: Callable[[str], Optional[Tuple[str, float]]]):
+        self.name = name
+        self.predict = predict
+
+    def classify(self, text: str) -> Optional[ModerationResult]:
+        prediction = self.predict(text)
+        if prediction is None:
+            return None
+        classification, confidence = prediction
+        return _result(classification, confidence, f"Local model '{self.name}' prediction", "Classified by a local model.")
+
+
+class Prefilter:
+    """
+    Runs CPU-only tiers in order ahead of the LLM.
+
+    The first tier whose verdict reaches min_confidence answers the request;
+    anything else is escalated to the LLM. Per-tier hit counts are kept so
+    the threshold can be tuned against LLM spend.
+    """
+
+    def __init__(self, tiers, min_confidence: float):
+        self.tiers = list(tiers)
+        self.min_confidence = min_confidence
+        self._lock = threading.Lock()
+        self.evaluated = 0
+        self.escalated = 0
+        self.tier_hits: Dict[str, int] = {tier.name: 0 for tier in self.tiers}
+        self.tier_below_threshold: Dict[str, int] = {tier.name: 0 for tier in self.tiers}
+
+    def register_tier(self, tier) -> None:
+        with self._lock:
+            self.tiers.append(tier)
+            self.tier_hits.setdefault(tier.name, 0)
+            self.tier_below_threshold.setdefault(tier.name, 0)
+
+    def classify(self, text: str) -> Optional[ModerationResult]:
+        verdict, hit_tier = None, None
+        for tier in self.tiers:
+            try:
+                result = tier.classify(text)
+            except Exception as e:
+                logger.warning(f"Pre-filter tier '{tier.name}' failed: {e}")
+                continue
+            if result is None:
+                continue
+            if result.confidence >= self.min_confidence:
+                verdict, hit_tier = result, tier.name
+                break
+            with self._lock:
+                self.tier_below_threshold[tier.name] += 1
+
+        with self._lock:
+            self.evaluated += 1
+            if hit_tier is None:
+                self.escalated += 1
+            else:
+                self.tier_hits[hit_tier] += 1
+        return verdict
+
+    def stats(self) -> dict:
+        with self._lock:
+            evaluated = self.evaluated or 1
+            return {
+                "enabled": config.PREFILTER_ENABLED,
+                "min_confidence": self.min_confidence,
+                "evaluated": self.evaluated,
+                "escalated": self.escalated,
+                "tiers": {
+                    name: {
+                        "hits": hits,
+                        "hit_rate": hits / evaluated,
+                        "below_threshold": self.tier_below_threshold[name],
+                    }
+                    for name, hits in self.tier_hits.items()
+                },
+            }
+
+
+def load_blocklist(path: Optional[str]) -> Dict[str, str]:
+    """
+    Read 'classification<TAB>phrase' lines; lines without a tab are treated as spam.
+    """
+    phrases = {phrase: "spam" for phrase in DEFAULT_SPAM_PHRASES}
+    if not path:
+        return phrases
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            classification, sep, phrase = line.partition("\t")
+            if not sep:
+                classification, phrase = "spam", line
+            phrases[phrase.strip()] = classification.strip()
+    return phrases
+
+
+def load_local_model(spec: Optional[str]):
+    """
+    Import an optional local model given as 'package.module:callable'.
+    """
+    if not spec:
+        return None
+    module_name, _, attr = spec.partition(":")
+    predict = getattr(importlib.import_module(module_name), attr)
+    return CallableTier("local_model", predict)
+
+
+def build_default_prefilter() -> Prefilter:
+    tiers = [
+        RegexTier([
+            (SAFE_GREETING_PATTERN, "safe", 0.97, "Short greeting or acknowledgement"),
+        ]),
+        KeywordTier(load_blocklist(config.PREFILTER_BLOCKLIST_PATH)),
+    ]
+    local_model = load_local_model(config.PREFILTER_LOCAL_MODEL)
+    if local_model is not None:
+        tiers.append(local_model)
+    return Prefilter(tiers, min_confidence=config.PREFILTER_MIN_CONFIDENCE)
+
+
+prefilter = build_default_prefilter()
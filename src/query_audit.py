@@ -0,0 +1,148 @@
+import argparse
+import re
+import sys
+from typing import List, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.engine import Engine
+
+from src import models
+from src.api.history import build_history_query
+from src.cache import verdict_cache
+from src.jobs import _claimable
+from src.rollups import ALL_REQUESTS
+
+# Plan lines that mean SQLite reads a whole table ("SCAN t" without "USING ... INDEX")
+SQLITE_TABLE_SCAN = re.compile(r"^SCAN (\w+)(?! USING (?:COVERING )?INDEX)(?:\s|$)")
+
+
+def hot_queries() -> List[Tuple[str, object]]:
+    """
+    The statements on the request and worker hot paths, with representative parameters.
+    """
+    email = "audit@example.com"
+    now = models.utcnow()
+    return [
+        ("verdict cache lookup", verdict_cache._recent_verdicts_stmt(["0" * 64, "1" * 64])),
+        ("analytics rollup by user", select(models.AnalyticsRollup).where(models.AnalyticsRollup.email == email)),
+        (
+            "notification logs by user",
+            select(models.NotificationLog)
+            .where(models.NotificationLog.request_id.in_(
+                select(models.ModerationRequest.id).where(models.ModerationRequest.email == email)
+            ))
+            .order_by(models.NotificationLog.sent_at.desc()),
+        ),
+        (
+            "last request by user",
+            select(models.ModerationRequest.created_at, models.ModerationRequest.id)
+            .where(models.ModerationRequest.email == email)
+            .order_by(models.ModerationRequest.created_at.desc())
+            .limit(1),
+        ),
+        (
+            "request count by user and content type",
+            select(func.count(models.ModerationRequest.id))
+            .where(models.ModerationRequest.email == email, models.ModerationRequest.content_type == "text"),
+        ),
+        ("request history page", build_history_query("requests", email, ["id", "status"], None).limit(50)),
+        ("result history page", build_history_query("results", email, ["id", "classification"], None).limit(50)),
+        (
+            "results for a request",
+            select(models.ModerationResult).where(models.ModerationResult.request_id == 1),
+        ),
+        (
+            "rollup request counts",
+            select(models.AnalyticsRollup.count).where(
+                models.AnalyticsRollup.email == email,
+                models.AnalyticsRollup.content_type == "text",
+                models.AnalyticsRollup.classification == ALL_REQUESTS,
+            ),
+        ),
+        (
+            "dedup index warm-up",
+            select(models.ModerationRequest.simhash, models.ModerationResult)
+            .join(models.ModerationResult, models.ModerationResult.request_id == models.ModerationRequest.id)
+            .where(models.ModerationRequest.content_type == "text", models.ModerationRequest.simhash.isnot(None))
+            .order_by(models.ModerationRequest.created_at.desc())
+            .limit(100),
+        ),
+        (
+            "latest job for a request",
+            select(models.ModerationJob)
+            .where(models.ModerationJob.request_id == 1, models.ModerationJob.kind == "image")
+            .order_by(models.ModerationJob.id.desc())
+            .limit(1),
+        ),
+        (
+            "job lease candidates",
+            select(models.ModerationJob.id).where(_claimable(now)).order_by(models.ModerationJob.id).limit(5),
+        ),
+    ]
+
+
+def _sqlite_scans(conn, sql: str) -> List[str]:
+    plan = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}").all()
+    return [row[-1] for row in plan if SQLITE_TABLE_SCAN.match(row[-1])]
+
+
+def _postgres_scans(conn, sql: str) -> List[str]:
+    # With sequential scans disabled the planner still picks one only when no index applies
+    conn.exec_driver_sql("SET LOCAL enable_seqscan = off")
+    plan = conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {sql}").scalar()
+    scans, stack = [], [plan[0]["Plan"]]
+    while stack:
+        node = stack.pop()
+        if node["Node Type"] == "Seq Scan":
+            scans.append(f"Seq Scan on {node['Relation Name']}")
+        stack.extend(node.get("Plans", []))
+    return scans
+
+
+def audit(bind: Engine) -> List[Tuple[str, List[str]]]:
+    """
+    EXPLAIN every hot query and return (name, table scans) for those that scan a table.
+    """
+    dialect = bind.dialect.name
+    if dialect == "sqlite":
+        find_scans = _sqlite_scans
+    elif dialect == "postgresql":
+        find_scans = _postgres_scans
+    else:
+        raise ValueError(f"Query audit does not support the {dialect} dialect")
+
+    regressions = []
+    for name, stmt in hot_queries():
+        # Literal parameters keep EXPLAIN independent of each driver's paramstyle
+        sql = str(stmt.compile(dialect=bind.dialect, compile_kwargs={"literal_binds": True}))
+        with bind.connect() as conn:
+            with conn.begin():
+                scans = find_scans(conn, sql)
+        if scans:
+            regressions.append((name, scans))
+    return regressions
+
+
+if __name__ == "__main__":
+    from sqlalchemy import create_engine
+    from src.database import DATABASE_URL, Base
+
+    parser = argparse.ArgumentParser(description="Fail if a hot-path query plan falls back to a table scan")
+    parser.add_argument("--url", default=DATABASE_URL, help="database to audit (defaults to DATABASE_URL)")
+    args = parser.parse_args()
+
+    if args.url.startswith("sqlite"):
+        # SQLite plans for tiny tables depend on their contents, so audit the
+        # declared schema on an empty in-memory database instead
+        bind = create_engine("sqlite://")
+        Base.metadata.create_all(bind=bind)
+    else:
+        # Audited as-is: indexes missing from an un-migrated database are reported
+        bind = create_engine(args.url)
+
+    regressions = audit(bind)
+    for name, scans in regressions:
+        print(f"FAIL {name}: {'; '.join(scans)}")
+    if regressions:
+        sys.exit(1)
+    print(f"OK: {len(hot_queries())} hot queries use indexes ({bind.dialect.name})")
@@ -0,0 +1,227 @@
+import argparse
+from datetime import datetime, timezone
+from typing import Optional
+
+from sqlalchemy import case, delete, event, func, insert, or_, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from src import models
+from src.logger import logger
+
+# Classification value of the rollup rows that count requests rather than results
+ALL_REQUESTS = "*"
+
+UPSERT_DIALECTS = {
+    "sqlite": sqlite.insert,
+    "postgresql": postgresql.insert,
+}
+
+
+def _naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _bump(deltas: dict, key: tuple, created_at: Optional[datetime], request_id: Optional[int]) -> None:
+    entry = deltas.setdefault(key, [0, None, None])
+    entry[0] += 1
+    created_at = _naive_utc(created_at)
+    if created_at is not None and (entry[1] is None or created_at >= entry[1]):
+        entry[1], entry[2] = created_at, request_id
+
+
+def upsert_rollups(connection, deltas: dict) -> None:
+    """
+    Add counts to the rollup rows keyed by (email, content_type, classification).
+    """
+    if not deltas:
+        return
+    table = models.AnalyticsRollup.__table__
+    rows = [
+        {
+            "email": email,
+            "content_type": content_type,
+            "classification": classification,
+            "count": count,
+            "last_request_at": last_request_at,
+            "last_request_id": last_request_id,
+        }
+        for (email, content_type, classification), (count, last_request_at, last_request_id) in deltas.items()
+    ]
+
+    dialect_insert = UPSERT_DIALECTS.get(connection.dialect.name)
+    if dialect_insert is not None:
+        stmt = dialect_insert(table)
+        newer = or_(
+            table.c.last_request_at.is_(None),
+            stmt.excluded.last_request_at >= table.c.last_request_at,
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.email, table.c.content_type, table.c.classification],
+            set_={
+                "count": table.c.count + stmt.excluded.count,
+                "last_request_at": case((newer, stmt.excluded.last_request_at), else_=table.c.last_request_at),
+                "last_request_id": case((newer, stmt.excluded.last_request_id), else_=table.c.last_request_id),
+            },
+        )
+        connection.execute(stmt, rows)
+        return
+
+    # Generic fallback for databases without INSERT ... ON CONFLICT
+    for row in rows:
+        key = (
+            (table.c.email == row["email"])
+            & (table.c.content_type == row["content_type"])
+            & (table.c.classification == row["classification"])
+        )
+        updated = connection.execute(
+            update(table).where(key).values(
+                count=table.c.count + row["count"],
+                last_request_at=func.coalesce(row["last_request_at"], table.c.last_request_at),
+                last_request_id=func.coalesce(row["last_request_id"], table.c.last_request_id),
+            )
+        )
+        if updated.rowcount == 0:
+            connection.execute(insert(table).values(**row))
+
+
+@event.listens_for(Session, "after_flush")
+def update_rollups_after_flush(session: Session, _flush_context) -> None:
+    """
+    Count newly inserted requests and results into the rollup table,
+    inside the same transaction as the rows themselves.
+    """
+    deltas = {}
+    pending_results = []
+    for obj in session.new:
+        if isinstance(obj, models.ModerationRequest):
+            _bump(deltas, (obj.email, obj.content_type, ALL_REQUESTS), obj.created_at, obj.id)
+        elif isinstance(obj, models.ModerationResult):
+            pending_results.append(obj)
+    if not deltas and not pending_results:
+        return
+
+    connection = session.connection()
+    # Results added by request_id alone (the image worker) need their request looked up
+    missing_ids = {r.request_id for r in pending_results if "request" not in r.__dict__ or r.request is None}
+    requests_by_id = {}
+    if missing_ids:
+        rows = connection.execute(
+            select(
+                models.ModerationRequest.id,
+                models.ModerationRequest.email,
+                models.ModerationRequest.content_type,
+                models.ModerationRequest.created_at,
+            ).where(models.ModerationRequest.id.in_(missing_ids))
+        ).all()
+        requests_by_id = {row.id: row for row in rows}
+
+    for result in pending_results:
+        req = result.__dict__.get("request") or requests_by_id.get(result.request_id)
+        if req is None:
+            continue
+        _bump(deltas, (req.email, req.content_type, result.classification), req.created_at, req.id)
+
+    upsert_rollups(connection, deltas)
+
+
+def rebuild_rollups(db: Session) -> int:
+    """
+    Recompute every rollup row from the requests and results tables.
+    """
+    requests = db.execute(
+        select(
+            models.ModerationRequest.email,
+            models.ModerationRequest.content_type,
+            func.count(models.ModerationRequest.id),
+            func.max(models.ModerationRequest.created_at),
+            func.max(models.ModerationRequest.id),
+        ).group_by(models.ModerationRequest.email, models.ModerationRequest.content_type)
+    ).all()
+    results = db.execute(
+        select(
+            models.ModerationRequest.email,
+            models.ModerationRequest.content_type,
+            models.ModerationResult.classification,
+            func.count(models.ModerationResult.id),
+            func.max(models.ModerationRequest.created_at),
+            func.max(models.ModerationRequest.id),
+        )
+        .join(models.ModerationResult, models.ModerationResult.request_id == models.ModerationRequest.id)
+        .group_by(
+            models.ModerationRequest.email,
+            models.ModerationRequest.content_type,
+            models.ModerationResult.classification,
+        )
+    ).all()
+
+    deltas = {}
+    for email, content_type, count, last_request_at, last_request_id in requests:
+        deltas[(email, content_type, ALL_REQUESTS)] = [count, last_request_at, last_request_id]
+    for email, content_type, classification, count, last_request_at, last_request_id in results:
+        deltas[(email, content_type, classification)] = [count, last_request_at, last_request_id]
+
+    db.execute(delete(models.AnalyticsRollup))
+    upsert_rollups(db.connection(), deltas)
+    db.commit()
+    return len(deltas)
+
+
+def ensure_rollups(db: Session) -> None:
+    """
+    Backfill the rollup table once if it is empty but requests already exist.
+    """
+    if db.scalar(select(models.AnalyticsRollup.id).limit(1)) is not None:
+        return
+    if db.scalar(select(models.ModerationRequest.id).limit(1)) is None:
+        return
+    rows = rebuild_rollups(db)
+    logger.info(f"Backfilled {rows} analytics rollup rows")
+
+
+async def load_summary(db: AsyncSession, email: str) -> dict:
+    """
+    Read a user's summary counters from the rollup table in one indexed lookup.
+    """
+    rows = (
+        await db.scalars(select(models.AnalyticsRollup).where(models.AnalyticsRollup.email == email))
+    ).all()
+    summary = {
+        "total_requests": 0,
+        "counts": {"text": {}, "image": {}},
+        "last_request_at": None,
+        "last_request_id": None,
+    }
+    for row in rows:
+        if row.classification == ALL_REQUESTS:
+            summary["total_requests"] += row.count
+            if row.last_request_at is not None and (
+                summary["last_request_at"] is None or row.last_request_at > summary["last_request_at"]
+            ):
+                summary["last_request_at"] = row.last_request_at
+                summary["last_request_id"] = row.last_request_id
+        else:
+            summary["counts"].setdefault(row.content_type, {})[row.classification] = row.count
+    return summary
+
+
+if __name__ == "__main__":
+    from src.database import SessionLocal, engine
+    from src.migrations import upgrade_schema
+
+    parser = argparse.ArgumentParser(description="Maintain the analytics rollup table")
+    parser.add_argument("--rebuild", action="store_true", help="recompute all rollup rows from stored results")
+    args = parser.parse_args()
+
+    upgrade_schema(engine)
+    db = SessionLocal()
+    try:
+        if args.rebuild:
+            print(f"Rebuilt {rebuild_rollups(db)} rollup rows")
+        else:
+            ensure_rollups(db)
+    finally:
+        db.close()
@@ -1,10 +1,16 @@
 from pydantic import BaseModel, EmailStr, Field
-from typing import Optional, Literal, Any, List
+from typing import Optional, Literal, Any, List, Annotated
 from datetime import datetime
 
 class TextModerationRequest(BaseModel):
     email: EmailStr
     text: str = Field(..., min_length=1, max_length=5000)
+    bypass_cache: bool = False
+
+class TextBatchModerationRequest(BaseModel):
+    email: EmailStr
+    texts: List[Annotated[str, Field(min_length=1, max_length=5000)]] = Field(..., min_length=1, max_length=500)
+    bypass_cache: bool = False
 
 class ImageModerationRequest(BaseModel):
     email: EmailStr
@@ -27,15 +33,38 @@ class ModerationRequestResponse(BaseModel):
 
     model_config = dict(from_attributes=True)
 
+class JobStatusResponse(BaseModel):
+    status: Literal["pending", "leased", "done", "dead"]
+    attempts: int
+    last_error: Optional[str] = None
+
+    model_config = dict(from_attributes=True)
+
+class ModerationStatusResponse(ModerationRequestResponse):
+    job: Optional[JobStatusResponse] = None
+
+class BatchItemResponse(BaseModel):
+    index: int
+    status: Literal["completed", "failed"]
+    request: Optional[ModerationRequestResponse] = None
+    error: Optional[str] = None
+
 
 class NotificationLogResponse(BaseModel):
     request_id: int
     channel: Literal["email", "slack"] 
-    status: Literal["pending", "send"]  
+    kind: Optional[str] = None
+    status: Literal["pending", "send", "failed"]  
     sent_at: datetime
+    transport: Optional[str] = None
+    latency_ms: Optional[float] = None
+    error: Optional[str] = None
 
     model_config = dict(from_attributes=True)
 
+class SummarySendRequest(BaseModel):
+    user: EmailStr
+
 class AnalyticsSummaryResponse(BaseModel):
     user: EmailStr
     total_requests: int
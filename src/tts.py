@@ -0,0 +1,352 @@
+import asyncio
+import hashlib
+import importlib
+import math
+import os
+import re
+import struct
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import AsyncIterator, Callable, Iterator, Optional
+
+from src.config import config
+from src.logger import logger
+from src.metrics import Histogram, stage_errors, stage_latency
+
+MEDIA_TYPES = {
+    "mp3": "audio/mpeg",
+    "wav": "audio/wav",
+}
+
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+")
+
+_DONE = object()
+
+
+def split_sentences(text: str) -> list:
+    return [sentence for sentence in SENTENCE_BOUNDARY.split(text.strip()) if sentence]
+
+
+class TTSBackend:
+    """
+    Synthesizes speech segment by segment; synthesize() is a blocking generator
+    that yields audio bytes as soon as each segment is ready.
+    """
+
+    name = "base"
+    media_type = "application/octet-stream"
+    extension = "bin"
+
+    def synthesize(self, text: str, lang: str, voice: str) -> Iterator[bytes]:
+        raise NotImplementedError
+
+
+class GTTSBackend(TTSBackend):
+    """
+    Google Translate TTS; gTTS splits long text into parts and fetches one MP3 per part.
+    """
+
+    name = "gtts"
+    media_type = "audio/mpeg"
+    extension = "mp3"
+
+    def synthesize(self, text: str, lang: str, voice: str) -> Iterator[bytes]:
+        from gtts import gTTS
+
+        # gTTS selects the accent through the Google Translate host (tld)
+        yield from gTTS(text=text, lang=lang, tld=voice or "com").stream()
+
+
+class ToneBackend(TTSBackend):
+    """
+    Offline stand-in engine: one short tone per word, sentence by sentence, as WAV.
+
+    Deterministic and dependency-free, for tests and benchmarks.
+    """
+
+    name = "local"
+    media_type = "audio/wav"
+    extension = "wav"
+
+    def __init__(self, sample_rate: int = 8000, word_seconds: float = 0.05):
+        self.sample_rate = sample_rate
+        self.word_seconds = word_seconds
+
+    def _header(self) -> bytes:
+        # Length unknown up front: use the maximum, as streaming WAV writers do
+        size = 0xFFFFFFFF
+        return (
+            b"RIFF" + struct.pack("<I", size) + b"WAVE"
+            + b"fmt " + struct.pack("<IHHIIHH", 16, 1, 1, self.sample_rate, self.sample_rate * 2, 2, 16)
+            + b"data" + struct.pack("<I", size - 36)
+        )
+
+    def _tone(self, words: int, pitch: float) -> bytes:
+        samples = int(self.sample_rate * self.word_seconds * max(1, words))
+        step = 2 * math.pi * pitch / self.sample_rate
+        return b"".join(struct.pack("<h", int(8000 * math.sin(step * i))) for i in range(samples))
+
+    def synthesize(self, text: str, lang: str, voice: str) -> Iterator[bytes]:
+        yield self._header()
+        for index, sentence in enumerate(split_sentences(text)):
+            yield self._tone(len(sentence.split()), 440 + 40 * (index % 5))
+
+
+class CallableBackend(TTSBackend):
+    """
+    Wraps a 'package.module:callable' taking (text, lang, voice) and yielding MP3 segments.
+    """
+
+    media_type = "audio/mpeg"
+    extension = "mp3"
+
+    def __init__(self, name: str, synthesize: Callable[[str, str, str], Iterator[bytes]]):
+        self.name = name
+        self._synthesize = synthesize
+
+    def synthesize(self, text: str, lang: str, voice: str) -> Iterator[bytes]:
+        yield from self._synthesize(text, lang, voice)
+
+
+def load_backend(spec: str) -> TTSBackend:
+    if spec == "gtts":
+        return GTTSBackend()
+    if spec == "local":
+        return ToneBackend()
+    if ":" in spec:
+        module_name, _, attr = spec.partition(":")
+        return CallableBackend(spec, getattr(importlib.import_module(module_name), attr))
+    raise ValueError(f"Unknown TTS_BACKEND '{spec}', expected gtts, local or 'package.module:callable'")
+
+
+class SpeechStreamer:
+    """
+    Streams synthesized audio while synthesis is still running, each segment
+    cut into chunks of at most chunk_size bytes.
+
+    The blocking backend runs in a worker thread and hands each segment to
+    the event loop through a bounded queue, so the first chunk goes out as
+    soon as the first segment is synthesized. Closing the stream (e.g. the
+    client disconnects) stops the thread after its current segment.
+    """
+
+    def __init__(self, backend: TTSBackend, chunk_size: int, max_buffered_segments: int):
+        self.backend = backend
+        self.chunk_size = max(1, chunk_size)
+        self.max_buffered_segments = max(1, max_buffered_segments)
+
+        self.first_chunk_histogram = Histogram([0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10])
+        self.synthesis_histogram = Histogram([0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30])
+        self.streams = 0
+        self.failed = 0
+        self.bytes = 0
+
+    @property
+    def media_type(self) -> str:
+        return self.backend.media_type
+
+    def _produce(self, text, lang, voice, queue, loop, cancelled: threading.Event) -> None:
+        def put(item) -> None:
+            asyncio.run_coroutine_threadsafe(queue.put(item), loop).result()
+
+        try:
+            for segment in self.backend.synthesize(text, lang, voice):
+                if cancelled.is_set():
+                    return
+                if segment:
+                    put(segment)
+            put(_DONE)
+        except Exception as e:
+            if not cancelled.is_set():
+                put(e)
+
+    async def stream(self, text: str, lang: str, voice: str) -> AsyncIterator[bytes]:
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue(self.max_buffered_segments)
+        cancelled = threading.Event()
+        started = time.perf_counter()
+        producer = loop.run_in_executor(None, self._produce, text, lang, voice, queue, loop, cancelled)
+
+        self.streams += 1
+        first = True
+        try:
+            while True:
+                item = await queue.get()
+                if item is _DONE:
+                    break
+                if isinstance(item, Exception):
+                    self.failed += 1
+                    stage_errors.inc("tts")
+                    raise item
+                # Each segment goes out as soon as it is synthesized, cut into fixed-size chunks
+                for offset in range(0, len(item), self.chunk_size):
+                    chunk = item[offset:offset + self.chunk_size]
+                    if first:
+                        self.first_chunk_histogram.observe(time.perf_counter() - started)
+                        first = False
+                    self.bytes += len(chunk)
+                    yield chunk
+            elapsed = time.perf_counter() - started
+            self.synthesis_histogram.observe(elapsed)
+            stage_latency.labels("tts").observe(elapsed)
+        finally:
+            cancelled.set()
+            # Unblock a producer waiting on the full queue so the thread can exit
+            while not queue.empty():
+                queue.get_nowait()
+            if not producer.done():
+                logger.debug("TTS stream closed early, synthesis stops after the current segment")
+
+    def stats(self) -> dict:
+        return {
+            "backend": self.backend.name,
+            "chunk_size": self.chunk_size,
+            "streams": self.streams,
+            "failed": self.failed,
+            "bytes": self.bytes,
+            "time_to_first_chunk_seconds": self.first_chunk_histogram.snapshot(),
+            "synthesis_seconds": self.synthesis_histogram.snapshot(),
+        }
+
+
+class AudioCache:
+    """
+    Size-bounded on-disk store of synthesized audio with LRU eviction.
+
+    Files are named by a SHA-256 key of (backend, text, lang, voice), so a
+    file's name doubles as its ETag. The first request streams the audio
+    to the client while writing it to a temporary file, which only becomes
+    visible once synthesis completes; later requests are served from disk.
+    Recency survives restarts through the files' modification times.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, tuple[str, int]]" = OrderedDict()
+        self._total_bytes = 0
+        self._loaded = False
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(backend: str, text: str, lang: str, voice: str) -> str:
+        return hashlib.sha256("\0".join((backend, lang, voice, text)).encode("utf-8")).hexdigest()
+
+    def _load(self) -> None:
+        if self._loaded:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        files = []
+        for entry in os.scandir(self.directory):
+            key, _, extension = entry.name.partition(".")
+            if not entry.is_file() or ".tmp" in entry.name or extension not in MEDIA_TYPES:
+                continue
+            stat_result = entry.stat()
+            files.append((stat_result.st_mtime, key, entry.path, stat_result.st_size))
+        for _, key, path, size in sorted(files):
+            self._entries[key] = (path, size)
+            self._total_bytes += size
+        self._loaded = True
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Return the cached file path for a key, marking it most recently used.
+        """
+        with self._lock:
+            self._load()
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        path = entry[0]
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                self._drop(key)
+            return None
+        return path
+
+    def _drop(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._total_bytes -= entry[1]
+
+    def _add(self, key: str, path: str, size: int) -> None:
+        evicted = []
+        with self._lock:
+            self._load()
+            self._drop(key)
+            self._entries[key] = (path, size)
+            self._total_bytes += size
+            self.stores += 1
+            while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+                old_key, (old_path, _) = next(iter(self._entries.items()))
+                self._drop(old_key)
+                evicted.append(old_path)
+                self.evictions += 1
+        for old_path in evicted:
+            try:
+                os.remove(old_path)
+            except FileNotFoundError:
+                pass
+
+    async def stream_and_store(self, key: str, extension: str, chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+        """
+        Pass audio chunks through while writing them to the cache.
+
+        Incomplete streams (synthesis errors, client disconnects) are discarded.
+        """
+        with self._lock:
+            self._load()
+        path = os.path.join(self.directory, f"{key}.{extension}")
+        tmp_path = f"{path}.tmp-{uuid.uuid4().hex}"
+        size = 0
+        complete = False
+        handle = await asyncio.to_thread(open, tmp_path, "wb")
+        try:
+            async for chunk in chunks:
+                await asyncio.to_thread(handle.write, chunk)
+                size += len(chunk)
+                yield chunk
+            complete = True
+        finally:
+            await asyncio.to_thread(handle.close)
+            if complete and size > 0:
+                await asyncio.to_thread(os.replace, tmp_path, path)
+                self._add(key, path, size)
+            else:
+                try:
+                    os.remove(tmp_path)
+                except FileNotFoundError:
+                    pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "stores": self.stores,
+                "evictions": self.evictions,
+            }
+
+
+speech_streamer = SpeechStreamer(
+    backend=load_backend(config.TTS_BACKEND),
+    chunk_size=config.TTS_CHUNK_SIZE,
+    max_buffered_segments=config.TTS_MAX_BUFFERED_SEGMENTS,
+)
+
+audio_cache = AudioCache(config.TTS_CACHE_DIR, config.TTS_CACHE_MAX_BYTES)
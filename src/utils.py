@@ -1,9 +1,15 @@
 import io
+import os
 import re
+import uuid
 import asyncio
+from typing import Union
 import cloudinary
 import cloudinary.uploader
+import requests
+from requests.adapters import HTTPAdapter
 from src.config import config
+from src.metrics import timed
 
 import hashlib
 
@@ -34,18 +40,77 @@ cloudinary.config(
     api_secret=config.CLOUDINARY_API_SECRET,
 )
 
-async def upload_image_to_cloudinary(image_bytes: bytes) -> str:
+# Pooled, keep-alive session for outbound HTTP fetches; always use with HTTP_TIMEOUT
+http_session = requests.Session()
+http_session.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=config.HTTP_POOL_SIZE))
+http_session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=config.HTTP_POOL_SIZE))
+HTTP_TIMEOUT = (config.HTTP_CONNECT_TIMEOUT_SECONDS, config.HTTP_READ_TIMEOUT_SECONDS)
+
+
+def fetch_url_bytes(url: str) -> bytes:
+    """
+    Download a URL through the shared session, raising on HTTP errors.
+    """
+    response = http_session.get(url, timeout=HTTP_TIMEOUT)
+    response.raise_for_status()
+    return response.content
+
+
+def read_file_bytes(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+class PayloadTooLargeError(ValueError):
+    """
+    Raised when an upload exceeds the configured size limit.
+    """
+
+
+async def spool_upload(upload, dest_dir: str, max_bytes: int, chunk_size: int):
+    """
+    Copy an uploaded file to dest_dir in fixed-size chunks.
+
+    The SHA-256 digest and size are computed while reading, and the copy
+    stops as soon as max_bytes is exceeded, so the whole image is never held
+    in memory. Returns (path, sha256_hex, size).
+    """
+    os.makedirs(dest_dir, exist_ok=True)
+    path = os.path.join(dest_dir, f"{uuid.uuid4().hex}.bin")
+    sha256_hash = hashlib.sha256()
+    size = 0
+    try:
+        with open(path, "wb") as out:
+            while True:
+                chunk = await upload.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise PayloadTooLargeError(f"Upload exceeds the {max_bytes} byte limit")
+                sha256_hash.update(chunk)
+                await asyncio.to_thread(out.write, chunk)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path, sha256_hash.hexdigest(), size
+
+
+async def upload_image_to_cloudinary(image: Union[bytes, str]) -> str:
     """
-    Upload image bytes asynchronously to Cloudinary and return secure URL.
+    Upload image bytes, or an image file by path, asynchronously to Cloudinary and return secure URL.
+
+    Paths are streamed from disk by the Cloudinary SDK instead of being loaded into memory.
     """
     try:
-        file_obj = io.BytesIO(image_bytes)
-        result = await asyncio.to_thread(
-            cloudinary.uploader.upload,
-            file_obj,
-            overwrite=True,
-            resource_type="image"
-        )
+        file_obj = io.BytesIO(image) if isinstance(image, bytes) else image
+        with timed("upload"):
+            result = await asyncio.to_thread(
+                cloudinary.uploader.upload,
+                file_obj,
+                overwrite=True,
+                resource_type="image"
+            )
         return result.get("secure_url")
     except Exception as e:
         raise RuntimeError(f"Cloudinary upload failed: {e}")
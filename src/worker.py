@@ -0,0 +1,187 @@
+import argparse
+import asyncio
+import os
+import signal
+import socket
+from typing import List, Optional
+
+from src.config import config
+from src.database import SessionLocal, engine
+from src.email_alerts import email_dispatcher
+from src.events import request_events
+from src.image_pipeline import process_image_moderation
+from src.migrations import upgrade_schema
+from src.jobs import lease_job, renew_lease, complete_job, fail_job
+from src.logger import logger
+from src.notifications import SUMMARY_EMAIL_JOB, send_summary_email
+from src.persistence import write_behind
+import src.rollups  # noqa: F401  keeps analytics rollups current when workers store results
+
+JOB_HANDLERS = {
+    "image": process_image_moderation,
+    SUMMARY_EMAIL_JOB: send_summary_email,
+}
+
+
+class WorkerPool:
+    """
+    Runs a fixed number of async workers that lease jobs from the database queue.
+
+    Each worker renews its lease while a job is running, so a crashed
+    process only delays its jobs by one lease timeout before another worker
+    picks them up.
+    """
+
+    def __init__(self, concurrency: int, name: Optional[str] = None):
+        self.concurrency = concurrency
+        self.name = name or f"{socket.gethostname()}-{os.getpid()}"
+        self._tasks: List[asyncio.Task] = []
+        self._stopping = asyncio.Event()
+        self.processed = 0
+        self.failed = 0
+        self.busy = 0
+
+    def start(self) -> None:
+        if self._tasks:
+            return
+        self._stopping.clear()
+        for i in range(self.concurrency):
+            self._tasks.append(asyncio.create_task(self._run(f"{self.name}-{i}")))
+        logger.info(f"Started {self.concurrency} job workers ({self.name})")
+
+    async def stop(self) -> None:
+        """
+        Stop leasing new jobs and wait for running ones to finish.
+        """
+        self._stopping.set()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        logger.info(f"Stopped job workers ({self.name})")
+
+    def request_stop(self) -> None:
+        self._stopping.set()
+
+    async def wait(self) -> None:
+        await self._stopping.wait()
+
+    async def _run(self, worker_id: str) -> None:
+        while not self._stopping.is_set():
+            try:
+                job = await asyncio.to_thread(self._lease, worker_id)
+            except Exception as e:
+                logger.error(f"Worker {worker_id} could not lease a job: {e}")
+                job = None
+
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), config.JOB_POLL_INTERVAL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            self.busy += 1
+            try:
+                await self._process(worker_id, job)
+            finally:
+                self.busy -= 1
+
+    @staticmethod
+    def _lease(worker_id: str):
+        db = SessionLocal()
+        try:
+            job = lease_job(db, worker_id)
+            if job is not None:
+                db.expunge(job)
+            return job
+        finally:
+            db.close()
+
+    async def _keep_lease(self, job_id: int, worker_id: str) -> None:
+        interval = max(1.0, config.JOB_LEASE_SECONDS / 3)
+        while True:
+            await asyncio.sleep(interval)
+
+            def renew():
+                db = SessionLocal()
+                try:
+                    return renew_lease(db, job_id, worker_id)
+                finally:
+                    db.close()
+
+            if not await asyncio.to_thread(renew):
+                logger.warning(f"Worker {worker_id} lost the lease on job {job_id}")
+                return
+
+    async def _process(self, worker_id: str, job) -> None:
+        job_id, request_id = job.id, job.request_id
+        handler = JOB_HANDLERS.get(job.kind)
+        heartbeat = asyncio.create_task(self._keep_lease(job_id, worker_id))
+        error = None
+        try:
+            if handler is None:
+                raise ValueError(f"No handler for job kind '{job.kind}'")
+            await handler(request_id, job.payload_path)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        finally:
+            heartbeat.cancel()
+
+        def finish():
+            db = SessionLocal()
+            try:
+                if error is None:
+                    return "done" if complete_job(db, job, worker_id) else None
+                return fail_job(db, job, worker_id, error)
+            finally:
+                db.close()
+
+        status = await asyncio.to_thread(finish)
+        if status is None:
+            # Another worker re-leased the job and now owns its outcome
+            logger.warning(f"Worker {worker_id} lost the lease on job {job_id} before recording its outcome")
+        elif status == "dead":
+            # Dead-lettered requests never complete; let status subscribers stop waiting
+            request_events.publish(request_id)
+        if error is None:
+            self.processed += 1
+            logger.info(f"Worker {worker_id} completed job {job_id} for request ID {request_id}")
+        else:
+            self.failed += 1
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "concurrency": self.concurrency,
+            "busy": self.busy,
+            "processed": self.processed,
+            "failed": self.failed,
+        }
+
+
+# Workers run inside the API process unless JOB_WORKERS_IN_PROCESS is 0
+in_process_workers = WorkerPool(config.JOB_WORKERS_IN_PROCESS)
+
+
+async def run_workers(concurrency: int) -> None:
+    upgrade_schema(engine)
+    pool = WorkerPool(concurrency)
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, pool.request_stop)
+        except NotImplementedError:
+            pass
+    pool.start()
+    await pool.wait()
+    await pool.stop()
+    # Deliver queued emails, then flush their notification logs
+    await email_dispatcher.stop()
+    await write_behind.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run moderation job workers")
+    parser.add_argument("--concurrency", type=int, default=config.JOB_WORKER_CONCURRENCY)
+    args = parser.parse_args()
+    asyncio.run(run_workers(args.concurrency))